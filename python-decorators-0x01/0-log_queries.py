@@ -1,40 +1,217 @@
 #!/usr/bin/python3
 """Creates a decorator that logs database queries executed by any function.
+
+The decorated call only builds a small record and appends it to a queue;
+a background thread formats the records and writes them out in batches.
 """
 import sqlite3
 import functools
+import atexit
+import collections
+import hashlib
+import json
+import random
+import threading
+import time
 from datetime import datetime
 import sys, os
 
 
-def log_queries(func):
+def _identity():
+    """Returns the (username, filename, pid) of the running process."""
+    try:
+        username = os.getlogin()
+    except OSError:
+        import getpass
+        username = getpass.getuser()
+    return username, os.path.basename(sys.argv[0]), os.getpid()
+
+
+def _fingerprint(params):
+    """Returns a short stable hash of the query parameters."""
+    if not params:
+        return None
+    return hashlib.blake2b(repr(params).encode(), digest_size=6).hexdigest()
+
+
+class QueryLogger():
+    """Queues query records and writes them from a background thread.
+
+    Records are dropped rather than blocking the caller when more than
+    <max_queue> are pending, when they are not sampled, or when the rate
+    cap is exceeded; `dropped` counts them.
+    """
+    def __init__(self, file=None, fmt='text', sample_rate=1.0,
+                 max_per_second=None, batch_size=256, flush_interval=0.5,
+                 max_queue=65536):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            file (file): Text file to write to, sys.stdout by default.
+            fmt (str): `text` for the syslog style line, `json` for one
+                JSON object per line.
+            sample_rate (float): Fraction of the queries logged.
+            max_per_second (int): Most records queued per second, or None.
+            batch_size (int): Pending records that wake the writer early.
+            flush_interval (int, float): Seconds between writes.
+            max_queue (int): Most records pending before dropping.
+        """
+        if fmt not in ('text', 'json'):
+            raise ValueError("Unknown log format: {}".format(fmt))
+        self.file = file
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.identity = _identity()
+        self.__records = collections.deque()
+        self.__wake = threading.Event()
+        self.__lock = threading.Lock()
+        self.__writing = threading.Lock()
+        self.__tokens = max_per_second
+        self.__refilled = time.monotonic()
+        self.__thread = None
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.__after_fork)
+
+    def __after_fork(self):
+        self.identity = _identity()
+        self.__records.clear()
+        self.__lock = threading.Lock()
+        self.__writing = threading.Lock()
+        self.__thread = None
+
+    def __admit(self):
+        """Applies sampling, the rate cap and the queue bound."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if len(self.__records) >= self.max_queue:
+            return False
+        if self.max_per_second is None:
+            return True
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.max_per_second, self.__tokens +
+                                (now - self.__refilled) * self.max_per_second)
+            self.__refilled = now
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+    def record(self, query, params, duration, rows, error=None):
+        """Queues one record; never blocks on I/O. <error> is the exception
+        the query raised, if any.
+        """
+        if not self.__admit():
+            self.dropped += 1
+            return
+        if error is not None:
+            # Kept as text so the traceback's frames are not held on to.
+            error = "{}: {}".format(type(error).__name__, error)
+        self.__records.append((time.time(), query, params, duration, rows,
+                               error))
+        if self.__thread is None:
+            self.__start()
+        if len(self.__records) >= self.batch_size:
+            self.__wake.set()
+
+    def __start(self):
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name='query-logger',
+                                                 daemon=True)
+                self.__thread.start()
+
+    def __run(self):
+        while True:
+            self.__wake.wait(self.flush_interval)
+            self.__wake.clear()
+            self.flush()
+
+    def __format(self, record):
+        timestamp, query, params, duration, rows, error = record
+        username, filename, pid = self.identity
+        if self.fmt == 'json':
+            return json.dumps({
+                'time': timestamp,
+                'user': username,
+                'process': filename,
+                'pid': pid,
+                'query': query,
+                'params': _fingerprint(params),
+                'duration_ms': round(duration * 1000, 3),
+                'rows': rows,
+                'error': error,
+                }) + '\n'
+        if error is not None:
+            detail = ', ' + error
+        elif rows is not None:
+            detail = ', {} rows'.format(rows)
+        else:
+            detail = ''
+        return "{} {} {}[{}]: SQL query {}: {} ({:.3f} ms{})\n".format(
+                datetime.fromtimestamp(timestamp).strftime("%b %d %H:%M:%S"),
+                username, filename, pid,
+                'executed' if error is None else 'failed', query,
+                duration * 1000, detail)
+
+    def flush(self):
+        """Writes every pending record in one write."""
+        with self.__writing:
+            records = self.__records
+            lines = []
+            while records:
+                lines.append(self.__format(records.popleft()))
+            if lines:
+                file = self.file or sys.stdout
+                file.write(''.join(lines))
+                file.flush()
+
+
+default_logger = QueryLogger()
+
+
+def log_queries(func=None, logger=None):
     """Logs database queries executed by any function.
+
+    Usable bare, `@log_queries`, or with a logger,
+    `@log_queries(logger=QueryLogger(sample_rate=0.1))`.
     Args:
         func (callable): Function to decorate.
+        logger (QueryLogger): Where records go, `default_logger` if None.
 
     Return:
         Decorated version of <func>.
     """
+    if func is None:
+        return functools.partial(log_queries, logger=logger)
+    if logger is None:
+        logger = default_logger
+
     @functools.wraps(func)
     def wrapper_log_queries(*args, **kwargs):
         query = kwargs.get('query', None)
+        params = kwargs.get('params', None)
         if query is None and len(args) > 0:
             query = args[0]
-        timestamp = datetime.now().strftime("%b %d %H:%M:%S")
+            if params is None and len(args) > 1:
+                params = args[1]
+        start = time.perf_counter()
         try:
-            username = os.getlogin()
-        except OSError:
-            import getpass
-            username = getpass.getuser()
-        filename = os.path.basename(sys.argv[0])
-        pid = os.getpid()
-        log = "{} {} {}[{}]: SQL query executed: {}".format(timestamp,
-                   username,
-                   filename,
-                   pid,
-                   query)
-        print(log)
-        func(*args, **kwargs)
+            result = func(*args, **kwargs)
+        except Exception as err:
+            logger.record(query, params, time.perf_counter() - start, None,
+                          err)
+            raise
+        duration = time.perf_counter() - start
+        rows = len(result) if isinstance(result, (list, tuple)) else None
+        logger.record(query, params, duration, rows)
+        return result
     return wrapper_log_queries
 
 
@@ -1,22 +1,10 @@
 #!/usr/bin/python3
-"""Creates a decorator that authomatically handles opening and closing database connections.
+"""Fetches a user with the decorator that authomatically handles opening and
+closing database connections, see `db_pool`.
 """
-import sqlite3
-import functools
+from db_pool import with_db_connection
 
 
-def with_db_connection(func):
-    """Authomatically handles opening and closing database connections.
-    """
-    @functools.wraps(func)
-    def wrapper_with_db_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper_with_db_connection
-
 @with_db_connection
 def get_user_by_id(conn, user_id):
     cursor = conn.cursor()
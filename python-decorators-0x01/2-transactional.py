@@ -1,30 +1,271 @@
 #!/usr/bin/python3
 """Creats a decorator that manages database transactions by automatically
 committing or rolling back changes.
+
+With a GroupCommitter, calls made close together (from several threads,
+or queued with `submit`) share a single commit, and so a single fsync:
+
+    committer = GroupCommitter(coalesce=True)
+
+    @with_db_connection
+    @transactional(group=committer)
+    def update_user_email(conn, user_id, new_email):
+        ...
 """
 import sqlite3
 import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import db_pool
+from db_pool import with_db_connection
 
 
-def with_db_connection(func):
-    """Authomatically handles opening and closing database connections.
+class _Recorder():
+    """Stands in for the connection of a coalesced call and records the
+    statements it executes; reading results is not possible.
     """
-    @functools.wraps(func)
-    def wrapper_with_db_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        result = func(conn, *args, **kwargs)
-        conn.close()
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, parameters=()):
+        self.statements.append((sql, parameters))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        for parameters in seq_of_parameters:
+            self.statements.append((sql, parameters))
+        return self
+
+    def __getattr__(self, name):
+        raise TypeError("Coalesced transactional calls can only execute "
+                        "statements, not use '{}'.".format(name))
+
+
+class GroupCommitter():
+    """Runs transactional calls on one connection owned by a background
+    thread and commits them in groups.
+
+    A group closes <max_delay> seconds after its first call or once it
+    holds <max_batch> calls. Each call runs inside its own SAVEPOINT, so
+    a call that raises is rolled back alone and gets its own exception;
+    the others only succeed once the group's COMMIT has.
+
+    With <coalesce>, calls only record the statements they execute, and
+    runs of the same statement across the group are sent with one
+    `executemany`. If that fails the group is replayed call by call to
+    find which calls fail.
+    """
+    def __init__(self, path=None, max_delay=0.002, max_batch=256,
+                 coalesce=False):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            path (str): Database file, `db_pool.DB_PATH` if None.
+            max_delay (int, float): Seconds a group stays open.
+            max_batch (int): Most calls per group.
+            coalesce (bool): Merge identical statements, see above.
+        """
+        self.path = path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+        self.commits = 0
+        self.calls = 0
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(conn, *args, **kwargs) and returns a Future that
+        resolves once its group is committed.
+        """
+        future = Future()
+        if self.coalesce:
+            recorder = _Recorder()
+            try:
+                result = func(recorder, *args, **kwargs)
+            except Exception as err:
+                future.set_exception(err)
+                return future
+            item = (future, recorder.statements, result)
+        else:
+            item = (future, func, (args, kwargs))
+        if self.__thread is None:
+            self.__start()
+        self.__queue.put(item)
+        return future
+
+    def __start(self):
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run,
+                                                 name='group-commit',
+                                                 daemon=True)
+                self.__thread.start()
+
+    def close(self):
+        """Commits what is queued and stops the background thread."""
+        with self.__lock:
+            thread, self.__thread = self.__thread, None
+        if thread is not None:
+            self.__queue.put(None)
+            thread.join()
+
+    def __run(self):
+        conn = None
+        try:
+            conn = db_pool.connect(self.path)
+            conn.isolation_level = None
+            while True:
+                item = self.__queue.get()
+                if item is None:
+                    return
+                group = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(group) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self.__queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.__queue.put(None)
+                        break
+                    group.append(item)
+                self.__commit(conn, group)
+        except BaseException as err:
+            self.__abandon(err)
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def __abandon(self, err):
+        """Forgets the dying background thread, so the next call starts a
+        new one, and fails the calls still queued with <err>.
+        """
+        with self.__lock:
+            if self.__thread is threading.current_thread():
+                self.__thread = None
+        while True:
+            try:
+                item = self.__queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and not item[0].done():
+                item[0].set_exception(err)
+
+    @staticmethod
+    def __apply(conn, item):
+        """Runs one call inside a savepoint; returns its result."""
+        future, work, extra = item
+        conn.execute("SAVEPOINT call")
+        try:
+            if callable(work):
+                args, kwargs = extra
+                result = work(conn, *args, **kwargs)
+            else:
+                for sql, parameters in work:
+                    conn.execute(sql, parameters)
+                result = extra
+        except BaseException:
+            conn.execute("ROLLBACK TO call")
+            conn.execute("RELEASE call")
+            raise
+        conn.execute("RELEASE call")
         return result
-    return wrapper_with_db_connection
 
-def transactional(func):
+    @staticmethod
+    def __runs(group):
+        """Merges the statements of <group> into (sql, [parameters])
+        runs, keeping their order.
+        """
+        runs = []
+        for _, statements, _ in group:
+            for sql, parameters in statements:
+                if runs and runs[-1][0] == sql:
+                    runs[-1][1].append(parameters)
+                else:
+                    runs.append((sql, [parameters]))
+        return runs
+
+    def __commit(self, conn, group):
+        group = [item for item in group
+                 if item[0].set_running_or_notify_cancel()]
+        done = []
+        try:
+            conn.execute("BEGIN")
+            if self.coalesce and self.__coalesced(conn, group):
+                done = [(future, result) for future, _, result in group]
+            else:
+                for item in group:
+                    try:
+                        done.append((item[0], self.__apply(conn, item)))
+                    except Exception as err:
+                        item[0].set_exception(err)
+            conn.execute("COMMIT")
+        except BaseException as err:
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _ in done:
+                future.set_exception(err)
+            for future, _, _ in group:
+                if not future.done():
+                    future.set_exception(err)
+            if not isinstance(err, Exception):
+                raise
+            return
+        self.commits += 1
+        self.calls += len(group)
+        for future, result in done:
+            future.set_result(result)
+
+    def __coalesced(self, conn, group):
+        """Sends the group as executemany runs; False if it has to be
+        replayed call by call.
+        """
+        conn.execute("SAVEPOINT grouped")
+        try:
+            for sql, seq_of_parameters in self.__runs(group):
+                conn.executemany(sql, seq_of_parameters)
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO grouped")
+            conn.execute("RELEASE grouped")
+            return False
+        conn.execute("RELEASE grouped")
+        return True
+
+
+def transactional(func=None, group=None):
     """Manages database transactiosn by automatically commiting or rolling
     back changes.
     Args:
         func (callable): Function to wrap.
+        group (GroupCommitter): Opt-in group commit; the call then runs on
+            the committer's connection instead of the one it was given.
     Returns:
         Decorator.
     """
+    if func is None:
+        return functools.partial(transactional, group=group)
+
+    if group is not None:
+        @functools.wraps(func)
+        def wrapper_group_commit(*args, **kwargs):
+            if 'conn' in kwargs:
+                kwargs.pop('conn')
+            else:
+                args = args[1:]
+            return group.submit(func, *args, **kwargs).result()
+        wrapper_group_commit.submit = functools.partial(group.submit, func)
+        return wrapper_group_commit
+
     @functools.wraps(func)
     def wrapper_transactional(*args, **kwargs):
         conn = kwargs.get('conn', None)
@@ -4,41 +4,125 @@
 """
 import time
 import sqlite3
+import asyncio
 import functools
+import inspect
+import random
+import threading
+from db_pool import with_db_connection
 
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
 
-def with_db_connection(func):
-    """Authomatically handles opening and closing database connections.
+
+def is_transient(err):
+    """Returns True when <err> may succeed if tried again, i.e. the
+    database was busy or locked.
+    """
+    if not isinstance(err, sqlite3.OperationalError):
+        return False
+    code = getattr(err, 'sqlite_errorcode', None)
+    if code is not None:
+        return (code & 0xff) in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(err).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class RetryCounters():
+    """Counts the retries and give-ups of the functions sharing it."""
+    def __init__(self):
+        self.retries = 0
+        self.give_ups = 0
+        self.__lock = threading.Lock()
+
+    def retried(self):
+        with self.__lock:
+            self.retries += 1
+
+    def gave_up(self):
+        with self.__lock:
+            self.give_ups += 1
+
+    def __repr__(self):
+        return "RetryCounters(retries={}, give_ups={})".format(
+                self.retries, self.give_ups)
+
+
+def retry_on_failure(retries, delay, max_delay=None, deadline=None,
+                     retry_if=is_transient, counters=None):
+    """Implements the <retry_on_failure> decorator.
+
+    Only errors for which <retry_if> is true are retried; the others are
+    raised at once. The n-th retry waits a random time between 0 and
+    delay * 2 ** (n - 1), capped at <max_delay> (full jitter), so callers
+    contending for a lock do not retry in step. Works on coroutine
+    functions too, sleeping with asyncio.sleep.
+    Args:
+        retries (int): Most attempts, the first one included.
+        delay (int, float): Base wait in seconds.
+        max_delay (int, float): Longest single wait, unbounded if None.
+        deadline (int, float): Seconds after the first attempt past which
+            no retry is started, unbounded if None.
+        retry_if (callable): Tells whether an exception is transient.
+        counters (RetryCounters): Where retries and give-ups are counted,
+            a new instance per function if None.
     """
-    @functools.wraps(func)
-    def wrapper_with_db_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper_with_db_connection
-
-def retry_on_failure(retries, delay):
-    """Implements the <retry_on_failure> decorator."""
+    def backoff(attempt, started):
+        """Returns the wait before retry <attempt>, or None to give up."""
+        if attempt >= retries:
+            return None
+        wait = delay * 2 ** (attempt - 1)
+        if max_delay is not None:
+            wait = min(wait, max_delay)
+        wait = random.uniform(0, wait)
+        if deadline is not None and \
+                time.monotonic() + wait - started > deadline:
+            return None
+        return wait
+
     def retry_on_failure_decorator(func):
         """Creates a decorator that retries database operations if they
         fail due to transient errors.
         """
-        @functools.wraps(func)
-        def wrapper_retry_on_failure(*args, **kwargs):
-            last_exception = None
-            for _ in range(retries):
-                try:
-                    return func(*args, **kwargs)
-                except (sqlite3.OperationalError,
-                        sqlite3.IntegrityError,
-                        sqlite3.ProgrammingError,
-                        sqlite3.DatabaseError,
-                        sqlite3.InterfaceError) as err:
-                    last_exception = err
-                    time.sleep(delay)
-            raise last_exception
+        stats = counters if counters is not None else RetryCounters()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_retry_on_failure(*args, **kwargs):
+                started = time.monotonic()
+                attempt = 1
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as err:
+                        if not retry_if(err):
+                            raise
+                        wait = backoff(attempt, started)
+                        if wait is None:
+                            stats.gave_up()
+                            raise
+                    stats.retried()
+                    await asyncio.sleep(wait)
+                    attempt += 1
+        else:
+            @functools.wraps(func)
+            def wrapper_retry_on_failure(*args, **kwargs):
+                started = time.monotonic()
+                attempt = 1
+                while True:
+                    try:
+                        return func(*args, **kwargs)
+                    except Exception as err:
+                        if not retry_if(err):
+                            raise
+                        wait = backoff(attempt, started)
+                        if wait is None:
+                            stats.gave_up()
+                            raise
+                    stats.retried()
+                    time.sleep(wait)
+                    attempt += 1
+        wrapper_retry_on_failure.counters = stats
         return wrapper_retry_on_failure
     return retry_on_failure_decorator
 
@@ -2,24 +2,12 @@
 """Creates a decorator that caches the results of a database queries inorder to avoid redundant calls.
 """
 import time
-import sqlite3
 import functools
+from db_pool import with_db_connection
 
 
 query_cache = {}
 
-def with_db_connection(func):
-    """Authomatically handles opening and closing database connections.
-    """
-    @functools.wraps(func)
-    def wrapper_with_db_connection(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper_with_db_connection
-
 def cache_query(func):
     @functools.wraps(func)
     def wrapper_cache_query(*args, **kwargs):
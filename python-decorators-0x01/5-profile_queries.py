@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+"""Creates a decorator that profiles database queries: per query shape
+latency histograms and call counts, with the query plan of slow calls.
+"""
+import sqlite3
+import functools
+import re
+import sys
+import threading
+import time
+from db_pool import with_db_connection
+
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b(?:0x[0-9a-f]+|\d+(?:\.\d+)?(?:e[+-]?\d+)?)\b",
+                      re.I)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalizes <query> so that calls differing only in literal values
+    share a fingerprint.
+
+    >>> fingerprint("SELECT * FROM users WHERE id IN (1, 2,3) -- ids")
+    'select * from users where id in (?+)'
+    """
+    query = _COMMENTS.sub(' ', query)
+    query = _STRINGS.sub('?', query)
+    query = _NUMBERS.sub('?', query)
+    query = _LISTS.sub('(?+)', query)
+    return _SPACES.sub(' ', query).strip().rstrip(';').strip().lower()
+
+
+class LatencyHistogram():
+    """Log-linear histogram of latencies in microseconds, in the style of
+    HdrHistogram: each power of two is split into 2 ** <precision>
+    linear buckets, so any quantile is within about 2 ** -precision of
+    the true value whatever the range.
+    """
+    def __init__(self, precision=5):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            precision (int): Bits of sub-bucket resolution.
+        """
+        self.precision = precision
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.__counts = {}
+
+    def add(self, seconds):
+        """Records one latency of <seconds>."""
+        micros = int(seconds * 1e6)
+        shift = max(micros.bit_length() - self.precision, 0)
+        key = micros >> shift << shift
+        self.__counts[key] = self.__counts.get(key, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Returns the latency in seconds at rank <q> (0 <= q <= 1)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for low in sorted(self.__counts):
+            seen += self.__counts[low]
+            if seen >= target:
+                width = 1 << max(low.bit_length() - self.precision, 0)
+                value = (low + (width - 1) / 2) / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class QueryProfiler():
+    """Collects a LatencyHistogram and slow call samples per fingerprint.
+
+    Calls slower than <slow_threshold> get an `EXPLAIN QUERY PLAN` run on
+    the same connection, at most <max_samples> times per fingerprint.
+    """
+    def __init__(self, slow_threshold=0.1, max_samples=5, precision=5):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            slow_threshold (int, float): Seconds above which a call is slow.
+            max_samples (int): Slow calls kept per fingerprint.
+            precision (int): See LatencyHistogram.
+        """
+        self.slow_threshold = slow_threshold
+        self.max_samples = max_samples
+        self.precision = precision
+        self.__stats = {}
+        self.__fingerprints = {}
+        self.__lock = threading.Lock()
+
+    def __fingerprint(self, query):
+        key = self.__fingerprints.get(query)
+        if key is None:
+            key = fingerprint(query)
+            if len(self.__fingerprints) < 10000:
+                self.__fingerprints[query] = key
+        return key
+
+    def record(self, query, seconds, conn=None, params=()):
+        """Records one call of <query> that took <seconds>."""
+        key = self.__fingerprint(query)
+        with self.__lock:
+            stats = self.__stats.get(key)
+            if stats is None:
+                stats = self.__stats[key] = {
+                    'histogram': LatencyHistogram(self.precision),
+                    'slow': [],
+                    }
+            stats['histogram'].add(seconds)
+            capture = (seconds > self.slow_threshold and
+                       len(stats['slow']) < self.max_samples)
+        if capture:
+            plan = self.explain(conn, query, params)
+            with self.__lock:
+                stats['slow'].append({'seconds': seconds, 'query': query,
+                                      'plan': plan})
+
+    @staticmethod
+    def explain(conn, query, params=()):
+        """Returns the `EXPLAIN QUERY PLAN` rows of <query>, or None when
+        there is no connection or the statement cannot be explained.
+        """
+        if not isinstance(conn, sqlite3.Connection):
+            return None
+        try:
+            cursor = conn.execute("EXPLAIN QUERY PLAN " + query,
+                                  params or ())
+            return [row[-1] for row in cursor.fetchall()]
+        except sqlite3.Error:
+            return None
+
+    def report(self, sort='total', limit=None):
+        """Returns one dict per fingerprint, hottest first.
+        Args:
+            sort (str): `total`, `count`, `p99` or `max`.
+            limit (int): Most fingerprints returned.
+        """
+        with self.__lock:
+            rows = [{
+                'fingerprint': key,
+                'count': stats['histogram'].count,
+                'total': stats['histogram'].total,
+                'p50': stats['histogram'].quantile(0.5),
+                'p95': stats['histogram'].quantile(0.95),
+                'p99': stats['histogram'].quantile(0.99),
+                'max': stats['histogram'].max,
+                'slow': list(stats['slow']),
+                } for key, stats in self.__stats.items()]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+    def dump(self, file=None, sort='total', limit=20):
+        """Writes the report as a table, slow call plans included."""
+        file = file or sys.stdout
+        lines = ["{:>8} {:>10} {:>9} {:>9} {:>9}  {}".format(
+                    'calls', 'total ms', 'p50 ms', 'p95 ms', 'p99 ms',
+                    'query')]
+        for row in self.report(sort, limit):
+            lines.append("{:>8} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f}  {}"
+                         .format(row['count'], row['total'] * 1000,
+                                 row['p50'] * 1000, row['p95'] * 1000,
+                                 row['p99'] * 1000, row['fingerprint']))
+            for sample in row['slow']:
+                lines.append("{:>8} {:>10.1f}  slow: {}".format(
+                                '', sample['seconds'] * 1000,
+                                '; '.join(sample['plan'] or ['no plan'])))
+        file.write('\n'.join(lines) + '\n')
+
+    def reset(self):
+        """Forgets everything recorded so far."""
+        with self.__lock:
+            self.__stats.clear()
+
+
+default_profiler = QueryProfiler()
+
+
+def profile_queries(func=None, profiler=None):
+    """Times every call of <func> under the fingerprint of its query.
+
+    The query is the `query` keyword or the first str argument, its
+    parameters the `params` keyword or the argument following it, and the
+    connection used for `EXPLAIN QUERY PLAN` the `conn` keyword or the
+    first sqlite3.Connection argument.
+    Args:
+        func (callable): Function to decorate.
+        profiler (QueryProfiler): Where calls are recorded,
+            `default_profiler` if None.
+
+    Return:
+        Decorated version of <func>.
+    """
+    if func is None:
+        return functools.partial(profile_queries, profiler=profiler)
+    if profiler is None:
+        profiler = default_profiler
+
+    @functools.wraps(func)
+    def wrapper_profile_queries(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        query = kwargs.get('query')
+        params = kwargs.get('params', ())
+        conn = kwargs.get('conn')
+        for i, arg in enumerate(args):
+            if conn is None and isinstance(arg, sqlite3.Connection):
+                conn = arg
+            elif query is None and isinstance(arg, str):
+                query = arg
+                if not params and i + 1 < len(args) and \
+                        isinstance(args[i + 1], (tuple, list, dict)):
+                    params = args[i + 1]
+        if query is not None:
+            profiler.record(query, seconds, conn, params)
+        return result
+    return wrapper_profile_queries
+
+
+@with_db_connection
+@profile_queries
+def fetch_users(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+#### profile a few queries and print the hottest ones
+for user_id in range(1, 51):
+    fetch_users("SELECT * FROM users WHERE id = ?", (user_id,))
+    fetch_users("SELECT * FROM users WHERE id = {}".format(user_id))
+fetch_users(query="SELECT * FROM users")
+default_profiler.dump()
@@ -1,19 +1,53 @@
 #!/usr/bin/python3
 import mysql.connector
 seed = __import__('seed')
+row_formats = __import__('row_formats')
+query_spec = __import__('query_spec')
+metrics = __import__('metrics')
 
-def stream_users():
+
+@metrics.instrument
+def stream_users(fetch_size=None, row_format='dict', spec=None):
     """A generator that fetches rows one by one from the `user_data` table.
+
+    The cursor is unbuffered, so rows are streamed from the server as they
+    are consumed instead of being buffered client side first.
+
+    Args:
+        fetch_size (int): Number of rows pulled from the server per round,
+            bounding the rows held in memory. Rows are read one at a time
+            when None.
+        row_format (str): `dict`, `tuple`, `namedtuple` or `slots`, see
+            the `row_formats` module.
+        spec (QuerySpec): Columns and conditions, pushed down to the
+            server where possible, see the `query_spec` module.
+        stats, log_interval: Optional instrumentation, see `metrics`.
     """
+    spec = spec or query_spec.QuerySpec()
+    spec.check_format(row_format)
+    query, params = spec.compile()
     try:
-        connection = seed.connect_to_prodev()
-        cursor = connection.cursor(dictionary=True)
+        with seed.pooled_connection() as connection:
+            binary_ids = seed.uses_binary_ids(connection)
+            cursor = row_formats.cursor_for(connection, row_format,
+                                            buffered=False)
 
-        cursor.execute("SELECT * FROM user_data;")
-        for row in cursor:
-            yield row
+            cursor.execute(query, params)
+            names = cursor.column_names
+            convert = row_formats.converter(row_format, names, binary_ids)
+            if fetch_size is None:
+                rows = map(convert, cursor) if convert else cursor
+                if spec.pushed_down:
+                    yield from rows
+                else:
+                    yield from (spec.strip(row, names) for row in rows
+                                if spec.matches(row, names))
+                return
+            rows = cursor.fetchmany(fetch_size)
+            while rows:
+                if convert:
+                    rows = list(map(convert, rows))
+                yield from spec.filter(rows, names)
+                rows = cursor.fetchmany(fetch_size)
     except mysql.connector.Error as err:
         print(f"{err.__class__.__name__}: {err}")
-    finally:
-        if connection:
-            connection.close()
@@ -2,41 +2,189 @@
 """Creates a generator to fetch and process data in batches from the
 users database.
 """
+import time
 import mysql.connector
 seed = __import__('seed')
+prefetching = __import__('prefetching')
+row_formats = __import__('row_formats')
+query_spec = __import__('query_spec')
+metrics = __import__('metrics')
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def stream_users_in_batches(batch_size):
+SIZE_SAMPLE_ROWS = 8
+SIZE_SAMPLE_EVERY = 64
+
+
+def to_columns(rows, column_names):
+    """Converts a list of row tuples into a dict of NumPy arrays.
+    Args:
+        rows (list): Row tuples as returned by `fetchmany`.
+        column_names (tuple): Name of each column in the rows.
+    """
+    columns = zip(*rows)
+    return {name: np.asarray(values)
+            for name, values in zip(column_names, columns)}
+
+
+class AdaptiveBatchSizer():
+    """Tunes the batch size from measured fetch throughput.
+
+    Starting from <initial>, the size grows by <growth> while each step
+    improves rows/sec by more than <tolerance>, then settles on the best
+    size seen. Every <probe_every> batches it probes one step larger again
+    in case the workload changed. The size never exceeds what fits
+    <memory_limit> bytes at the measured row size.
+    """
+    def __init__(self, initial=16, maximum=100_000, memory_limit=64 << 20,
+                 growth=2.0, tolerance=0.05, probe_every=50):
+        self.size = initial
+        self.maximum = maximum
+        self.memory_limit = memory_limit
+        self.growth = growth
+        self.tolerance = tolerance
+        self.probe_every = probe_every
+        self.best_size = initial
+        self.best_rate = None
+        self.growing = True
+        self.__settled = 0
+
+    def record(self, rows, seconds, nbytes):
+        """Feeds back one fetch of <rows> rows that took <seconds> and
+        holds about <nbytes> bytes, and picks the next size.
+        """
+        if not rows:
+            return
+        rate = rows / max(seconds, 1e-9)
+        if self.growing:
+            if self.best_rate is None or \
+                    rate > self.best_rate * (1 + self.tolerance):
+                self.best_size, self.best_rate = self.size, rate
+                self.size = int(self.size * self.growth) + 1
+            else:
+                self.growing = False
+                self.size = self.best_size
+        elif self.size == self.best_size:
+            self.best_rate = 0.8 * self.best_rate + 0.2 * rate
+            self.__settled += 1
+            if self.__settled >= self.probe_every:
+                self.__settled = 0
+                self.growing = True
+                self.size = int(self.size * self.growth) + 1
+
+        ceiling = max(1, self.memory_limit * rows // max(nbytes, 1))
+        self.size = max(1, min(self.size, self.maximum, ceiling))
+        self.best_size = max(1, min(self.best_size, self.maximum, ceiling))
+
+
+@metrics.instrument
+def stream_users_in_batches(batch_size, columnar=False, row_format='dict',
+                            spec=None, adaptive=False):
     """Fetches rows in batches:
     Args:
         batch_size (int): Batch size.
+        columnar (bool): Yield each batch as a dict of NumPy arrays keyed
+            by column name instead of a list of rows.
+        row_format (str): `dict`, `tuple`, `namedtuple` or `slots`, see
+            the `row_formats` module. Ignored for columnar batches.
+        spec (QuerySpec): Columns and conditions, pushed down to the
+            server where possible, see the `query_spec` module. Batches
+            hold at most <batch_size> rows after any Python side filtering.
+        adaptive (bool, AdaptiveBatchSizer): Tune the batch size from
+            measured fetch latency and row size, starting at <batch_size>.
+            Pass a sizer to change its limits.
+        stats, log_interval: Optional instrumentation, see `metrics`.
     """
+    sizer = None
+    if isinstance(adaptive, AdaptiveBatchSizer):
+        sizer = adaptive
+    elif adaptive:
+        sizer = AdaptiveBatchSizer(initial=batch_size)
+    spec = spec or query_spec.QuerySpec()
+    if columnar and np is None:
+        raise ImportError("numpy is required for columnar batches.")
+    if not columnar:
+        spec.check_format(row_format)
+    query, params = spec.compile()
     try:
-        connection = seed.connect_to_prodev()
-        cursor = connection.cursor(dictionary=True)
+        with seed.pooled_connection() as connection:
+            if columnar:
+                row_format = 'tuple'
+            binary_ids = seed.uses_binary_ids(connection)
+            cursor = row_formats.cursor_for(connection, row_format)
 
-        cursor.execute("SELECT * FROM user_data;")
+            cursor.execute(query, params)
+            names = cursor.column_names
+            convert = row_formats.converter(row_format, names, binary_ids)
 
-        while True:
-            batch = cursor.fetchmany(batch_size)
-            if not batch:
-                break
-            yield batch
+            row_bytes, fetches = 0, 0
+            while True:
+                if sizer is None:
+                    batch = cursor.fetchmany(batch_size)
+                else:
+                    start = time.perf_counter()
+                    batch = cursor.fetchmany(sizer.size)
+                    elapsed = time.perf_counter() - start
+                    # Row size is estimated from a few rows now and then;
+                    # sizing every row would cost more than the fetch.
+                    if batch and fetches % SIZE_SAMPLE_EVERY == 0:
+                        sample = batch[:SIZE_SAMPLE_ROWS]
+                        row_bytes = (sum(map(prefetching.row_size, sample)) /
+                                     len(sample))
+                    fetches += 1
+                    sizer.record(len(batch), elapsed,
+                                 int(row_bytes * len(batch)))
+                if not batch:
+                    break
+                if convert:
+                    batch = list(map(convert, batch))
+                batch = spec.filter(batch, names)
+                if not batch:
+                    continue
+                if columnar:
+                    batch = to_columns(batch, spec.output_columns(names))
+                yield batch
     except mysql.connector.Error as err:
         print(f"{err.__class__.__name__}: {err}")
-    finally:
-        if connection:
-            connection.close()
 
 
-def batch_processing(batch_size):
-    """Processes each batch to filter users over the age of 25.
+def batch_processing(batch_size, columnar=False, prefetch=0, sink=None):
+    """Processes each batch to filter users over the age of 25. The filter
+    runs on the server, so only matching users are fetched.
     Args:
         batch_size (int): Batch Size.
+        columnar (bool): Fetch batches as NumPy columns and hand them
+            to <sink> as they are, with no per row work in Python. Needs
+            a sink with `write_columns`, e.g. `sinks.ArrowSink`.
+        prefetch (int): Number of batches fetched ahead on a background
+            thread while the current one is processed; 0 disables it.
+        sink (Sink): Output sink from the `sinks` module receiving each
+            filtered batch. Users are printed one by one when None.
     """
-    for batch in stream_users_in_batches(batch_size):
-        filtered = [user for user in batch if user.get('age') > 25]
-        for user in filtered:
+    if columnar and not hasattr(sink, 'write_columns'):
+        raise ValueError("Columnar batches need a sink with write_columns.")
+    over_25 = query_spec.QuerySpec(where=[('age', '>', 25)])
+    batches = stream_users_in_batches(batch_size, columnar, spec=over_25)
+    if prefetch:
+        batches = prefetching.prefetch(batches, prefetch)
+
+    if columnar:
+        for batch in batches:
+            sink.write_columns(batch)
+        sink.flush()
+        return
+
+    if sink is not None:
+        for batch in batches:
+            sink.write_batch(batch, row_formats.USER_COLUMNS)
+        sink.flush()
+        return
+
+    for batch in batches:
+        for user in batch:
             print(user)
 
     return
@@ -1,28 +1,117 @@
 #!/usr/bin/python3
-"""Simulate fetching paginated data from the users database using a 
+"""Simulate fetching paginated data from the users database using a
 generator to lazily load each page.
 """
+import base64
+import json
 seed = __import__('seed')
+row_formats = __import__('row_formats')
+metrics = __import__('metrics')
 
 
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
+def paginate_users(page_size, offset, row_format='dict'):
+    with seed.pooled_connection() as connection:
+        cursor = row_formats.cursor_for(connection, row_format)
+        cursor.execute(f"SELECT {row_formats.USER_SELECT} FROM user_data LIMIT {page_size} OFFSET {offset}")
+        rows = _convert(cursor, cursor.fetchall(), row_format)
+        cursor.close()
     return rows
 
-def lazy_pagination(page_size):
+
+def _convert(cursor, rows, row_format):
+    """Converts fetched rows into <row_format>, with BINARY(16) user ids
+    turned into UUID text.
+    """
+    names = cursor.column_names
+    binary_ids = bool(rows) and 'user_id' in names and isinstance(
+            row_formats.field(rows[0], 'user_id', names), (bytes, bytearray))
+    convert = row_formats.converter(row_format, names, binary_ids)
+    return list(map(convert, rows)) if convert else rows
+
+
+def encode_token(user_id):
+    """Encodes the last seen key into an opaque continuation token."""
+    if isinstance(user_id, (bytes, bytearray)):
+        state = {'after': bytes(user_id).hex(), 'binary': True}
+    else:
+        state = {'after': user_id}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_token(token):
+    """Decodes a continuation token back into the last seen key."""
+    state = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if state.get('binary'):
+        return bytes.fromhex(state['after'])
+    return state['after']
+
+
+def paginate_users_keyset(connection, page_size, token=None,
+                          row_format='dict'):
+    """Fetches the page of users that follows <token>, seeking on the
+    `user_id` primary key instead of skipping rows with OFFSET.
+
+    Args:
+        connection (MySQLConnection): Open connection to ALX_prodev.
+        page_size (int): Size data to fetch.
+        token (str): Continuation token of the previous page, None for the
+            first page.
+        row_format (str): `dict`, `tuple`, `namedtuple` or `slots`, see
+            the `row_formats` module.
+
+    Returns:
+        tuple: (rows, next_token). next_token is None on the last page.
+    """
+    cursor = row_formats.cursor_for(connection, row_format)
+    if token is None:
+        cursor.execute("SELECT {} FROM user_data ORDER BY user_id "
+                       "LIMIT %s".format(row_formats.USER_SELECT),
+                       (page_size,))
+    else:
+        cursor.execute("SELECT {} FROM user_data WHERE user_id > %s "
+                       "ORDER BY user_id LIMIT %s".format(
+                           row_formats.USER_SELECT),
+                       (decode_token(token), page_size))
+    rows = cursor.fetchall()
+    next_token = None
+    if len(rows) == page_size:
+        # Taken before conversion so the token keeps the stored key.
+        next_token = encode_token(
+                row_formats.field(rows[-1], 'user_id', cursor.column_names))
+    rows = _convert(cursor, rows, row_format)
+    cursor.close()
+    return rows, next_token
+
+
+@metrics.instrument
+def lazy_pagination(page_size, keyset=False, token=None, row_format='dict'):
     """Simulates fetching paginated data from the ALX_prodev
     database.
 
     Args:
         page_size (int): Size data to fetch.
+        keyset (bool): Seek on `user_id` over a single connection so every
+            page costs the same as the first.
+        token (str): Continuation token to resume from in keyset mode.
+        row_format (str): `dict`, `tuple`, `namedtuple` or `slots`, see
+            the `row_formats` module.
+        stats, log_interval: Optional instrumentation, see `metrics`.
     """
+    if keyset:
+        with seed.pooled_connection() as connection:
+            rows, token = paginate_users_keyset(connection, page_size, token,
+                                                row_format)
+            while rows:
+                yield rows
+                if token is None:
+                    break
+                rows, token = paginate_users_keyset(connection, page_size,
+                                                    token, row_format)
+        return
+
     offset = 0
-    rows = paginate_users(page_size, offset)
+    rows = paginate_users(page_size, offset, row_format)
     while rows:
         offset += len(rows)
         yield rows
-        rows = paginate_users(page_size, offset)
+        rows = paginate_users(page_size, offset, row_format)
@@ -1,9 +1,10 @@
 #!/usr/bin/python3
 import sys
 processing = __import__('1-batch_processing')
+sinks = __import__('sinks')
 
 ##### print processed users in a batch of 50
 try:
-    processing.batch_processing(50)
+    processing.batch_processing(50, sink=sinks.ReprSink(sys.stdout))
 except BrokenPipeError:
     sys.stderr.close()
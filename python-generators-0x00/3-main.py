@@ -1,12 +1,13 @@
 #!/usr/bin/python3
 import sys
 lazy_paginator = __import__('2-lazy_paginate').lazy_pagination
+sinks = __import__('sinks')
 
 
 try:
-    for page in lazy_paginator(100):
-        for user in page:
-            print(user)
+    with sinks.ReprSink(sys.stdout) as sink:
+        for page in lazy_paginator(100):
+            sink.write_batch(page)
 
 except BrokenPipeError:
     sys.stderr.close()
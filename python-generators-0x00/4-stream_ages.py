@@ -2,28 +2,34 @@
 """Objective: To use a generator to compute a memory-efficient
     aggregate function i.e average age for a large dataset.
 """
+import sys
 seed = __import__('seed')
+aggregates = __import__('aggregates')
+metrics = __import__('metrics')
 
 
+@metrics.instrument
 def stream_user_ages():
-    """Yields user ages one by one."""
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    try:
+    """Yields user ages one by one.
+
+    Args:
+        stats, log_interval: Optional instrumentation, see `metrics`.
+    """
+    with seed.pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
         cursor.execute("SELECT age FROM user_data;")
-        age = cursor.fetchone()
-        while age:
+        for age in cursor:
             yield age
-            age = cursor.fetchone()
-    finally:
         cursor.close()
-        connection.close()
 
 
 if __name__ == "__main__":
-    total_age = 0
-    count = 0
-    for row in stream_user_ages():
-        total_age += row.get('age')
-        count += 1
-    print("Average age of users: {}".format(total_age / count))
+    if '--summary' in sys.argv:
+        with seed.pooled_connection() as connection:
+            summary = aggregates.age_summary(connection)
+    elif '--sql' in sys.argv:
+        with seed.pooled_connection() as connection:
+            summary = aggregates.sql_aggregates(connection, 'age')
+    else:
+        summary = aggregates.aggregate(stream_user_ages())
+    print("Average age of users: {}".format(summary['mean']))
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+"""Incrementally streams the users added to the `user_data` table since
+the last run, using the `seq` column as a persisted high-water mark.
+"""
+import json
+import os
+import time
+seed = __import__('seed')
+row_formats = __import__('row_formats')
+metrics = __import__('metrics')
+
+STATE_FILE = 'user_data.hwm'
+
+
+def load_state(state_file=STATE_FILE):
+    """Returns the (mark, pending) pair saved in <state_file>: every row
+    up to `seq` <mark> was delivered, and <pending> maps the seq of each
+    row delivered above it to the time it was first read.
+    """
+    try:
+        with open(state_file, mode='r', encoding='utf-8') as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return 0, {}
+    pending = state.get('pending', {})
+    return state['seq'], {int(seq): seen for seq, seen in pending.items()}
+
+
+def save_state(mark, pending, state_file=STATE_FILE):
+    """Atomically persists the high-water mark and the pending rows."""
+    temporary = state_file + '.tmp'
+    with open(temporary, mode='w', encoding='utf-8') as file:
+        json.dump({'seq': mark, 'pending': pending}, file)
+    os.replace(temporary, state_file)
+
+
+def _advance(mark, pending, horizon):
+    """Moves <mark> over the delivered rows of <pending> that can no
+    longer have an undelivered row below them, and returns it.
+
+    The mark follows contiguous seqs at once. A gap is waited on until the
+    rows above it were first read before <horizon>; it is then taken as a
+    rolled back insert or an AUTO_INCREMENT hole and skipped.
+    """
+    expired = [seq for seq, seen in pending.items() if seen <= horizon]
+    if expired:
+        mark = max(mark, max(expired))
+    while mark + 1 in pending:
+        mark += 1
+    for seq in [seq for seq in pending if seq <= mark]:
+        del pending[seq]
+    return mark
+
+
+def _gaps(mark, pending, limit):
+    """Returns up to <limit> of the lowest seqs above <mark> that are
+    missing below the highest pending one.
+    """
+    gaps = []
+    if pending:
+        for seq in range(mark + 1, max(pending)):
+            if seq not in pending:
+                gaps.append(seq)
+                if len(gaps) == limit:
+                    break
+    return gaps
+
+
+@metrics.instrument
+def tail_users(state_file=STATE_FILE, batch_size=1000, follow=False,
+               poll_interval=1.0, row_format='dict', lag=5.0):
+    """Yields the users added since the last run, one by one, each with
+    its `seq` (except in the `slots` format).
+
+    AUTO_INCREMENT values are handed out at insert time but become visible
+    at commit, so concurrent writers can commit a lower `seq` after a
+    higher one was read. Rows above the first missing `seq` are therefore
+    remembered, and each poll looks the missing seqs up again, until they
+    fill or <lag> seconds pass. Rows committing within <lag> seconds of a
+    higher `seq` being read are delivered, exactly once. While batches
+    come back full the stream is catching up on old rows, and a gap is
+    only looked up once before being skipped.
+
+    The state is saved once every row of a batch has been consumed, so a
+    run that stops early re-delivers at most one batch next time.
+
+    Args:
+        state_file (str): File holding the high-water mark.
+        batch_size (int): New rows read per query.
+        follow (bool): Keep polling for new users instead of stopping once
+            caught up.
+        poll_interval (int, float): Seconds between polls when following.
+        row_format (str): `dict`, `tuple`, `namedtuple` or `slots`, see
+            the `row_formats` module.
+        lag (int, float): Seconds a gap in `seq` is waited on.
+        stats, log_interval: Optional instrumentation, see `metrics`.
+    """
+    mark, pending = load_state(state_file)
+    new_query = ("SELECT {}, seq FROM user_data WHERE seq > %s "
+                 "ORDER BY seq LIMIT %s".format(row_formats.USER_SELECT))
+    gap_query = ("SELECT {}, seq FROM user_data WHERE seq IN ({{}}) "
+                 "ORDER BY seq".format(row_formats.USER_SELECT))
+    last = None
+    with seed.pooled_connection() as connection:
+        binary_ids = seed.uses_binary_ids(connection)
+        while True:
+            cursor = row_formats.cursor_for(connection, row_format)
+            rows = []
+            gaps = _gaps(mark, pending, batch_size)
+            if gaps:
+                cursor.execute(gap_query.format(', '.join(['%s'] * len(gaps))),
+                               gaps)
+                rows = cursor.fetchall()
+            cursor.execute(new_query,
+                           (max(pending) if pending else mark, batch_size))
+            new_rows = cursor.fetchall()
+            rows.extend(new_rows)
+            names = cursor.column_names
+            cursor.close()
+            # End the read snapshot so the next poll sees new commits.
+            connection.commit()
+
+            now = time.time()
+            if rows:
+                convert = row_formats.converter(row_format, names, binary_ids)
+                yield from map(convert, rows) if convert else rows
+                for row in rows:
+                    pending[row_formats.field(row, 'seq', names)] = now
+            full = len(new_rows) == batch_size
+            horizon = now - lag
+            if full and last is not None:
+                # Catching up: gaps behind the previous batch were looked
+                # up once above and are not waited on.
+                horizon = max(horizon, last)
+            last = now
+            previous = (mark, len(pending))
+            mark = _advance(mark, pending, horizon)
+            if rows or (mark, len(pending)) != previous:
+                save_state(mark, pending, state_file)
+            if full:
+                continue
+            if not follow:
+                break
+            time.sleep(poll_interval)
+
+if __name__ == "__main__":
+    for user in tail_users():
+        print(user)
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+"""One-pass, constant memory aggregates over column streams such as
+`stream_user_ages`.
+"""
+import math
+import random
+import re
+seed = __import__('seed')
+
+
+class RunningStats():
+    """Count, mean, variance, min and max updated one value at a time
+    using Welford's algorithm.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self.__m2 = 0.0
+
+    def add(self, value):
+        """Adds <value> to the running statistics."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.__m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def variance(self):
+        """Population variance of the values seen so far."""
+        return self.__m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        """Population standard deviation of the values seen so far."""
+        return math.sqrt(self.variance)
+
+
+class Histogram():
+    """Fixed width histogram over [low, high). Values outside the range
+    are counted in the first or last bucket.
+    """
+    def __init__(self, low, high, bins=10):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            low (int, float): Lower bound of the first bucket.
+            high (int, float): Upper bound of the last bucket.
+            bins (int): Number of buckets.
+        """
+        self.low = low
+        self.high = high
+        self.width = (high - low) / bins
+        self.counts = [0] * bins
+
+    def add(self, value):
+        """Counts <value> in its bucket."""
+        index = int((value - self.low) // self.width)
+        self.counts[min(max(index, 0), len(self.counts) - 1)] += 1
+
+    def buckets(self):
+        """Returns a list of ((start, end), count) pairs."""
+        return [((self.low + i * self.width, self.low + (i + 1) * self.width),
+                 count) for i, count in enumerate(self.counts)]
+
+
+class QuantileSketch():
+    """KLL sketch giving approximate quantiles in O(k log(n/k)) memory."""
+    def __init__(self, k=200):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            k (int): Accuracy parameter; rank error is roughly 1.7 / k.
+        """
+        self.k = k
+        self.count = 0
+        self.__compactors = [[]]
+
+    def __capacity(self, level):
+        height = len(self.__compactors)
+        return max(2, int(math.ceil(self.k * (2 / 3) ** (height - level - 1))))
+
+    def add(self, value):
+        """Adds <value> to the sketch."""
+        self.count += 1
+        self.__compactors[0].append(value)
+        if len(self.__compactors[0]) >= self.__capacity(0):
+            self.__compress()
+
+    def __compress(self):
+        for level, items in enumerate(self.__compactors):
+            if len(items) < self.__capacity(level):
+                continue
+            if level + 1 == len(self.__compactors):
+                self.__compactors.append([])
+            items.sort()
+            offset = random.getrandbits(1)
+            self.__compactors[level + 1].extend(items[offset::2])
+            del items[:]
+
+    def quantile(self, q):
+        """Returns the approximate value at rank <q> (0 <= q <= 1)."""
+        weighted = sorted((value, 1 << level)
+                          for level, items in enumerate(self.__compactors)
+                          for value in items)
+        if not weighted:
+            return None
+        target = q * sum(weight for _, weight in weighted)
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+
+def aggregate(values, bins=10, low=0, high=100, quantiles=(0.5, 0.9, 0.99)):
+    """Computes every aggregate over <values> in a single pass.
+
+    Args:
+        values (iterable): Numbers, or rows from `stream_user_ages`.
+        bins, low, high: Histogram layout.
+        quantiles (tuple): Ranks to estimate.
+
+    Returns:
+        dict: count, mean, variance, stddev, min, max, histogram and
+            quantiles.
+    """
+    stats = RunningStats()
+    histogram = Histogram(low, high, bins)
+    sketch = QuantileSketch()
+    for value in values:
+        if isinstance(value, dict):
+            value = next(iter(value.values()))
+        stats.add(value)
+        histogram.add(value)
+        sketch.add(value)
+    return {
+        'count': stats.count,
+        'mean': stats.mean,
+        'variance': stats.variance,
+        'stddev': stats.stddev,
+        'min': stats.min,
+        'max': stats.max,
+        'histogram': histogram.buckets(),
+        'quantiles': {q: sketch.quantile(q) for q in quantiles},
+        }
+
+
+def sql_aggregates(connection, column='age', table='user_data'):
+    """Computes the exact simple aggregates on the server instead of
+    streaming the column.
+
+    Args:
+        connection (MySQLConnection): Open connection to ALX_prodev.
+        column (str): Column to aggregate.
+        table (str): Table holding <column>.
+
+    Returns:
+        dict: count, mean, variance, stddev, min and max.
+    """
+    for name in (column, table):
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+            raise ValueError("Invalid identifier: {}".format(name))
+    cursor = connection.cursor()
+    cursor.execute(
+            "SELECT COUNT(`{0}`), AVG(`{0}`), VAR_POP(`{0}`), "
+            "MIN(`{0}`), MAX(`{0}`) FROM `{1}`;".format(column, table))
+    count, mean, variance, minimum, maximum = cursor.fetchone()
+    cursor.close()
+    return {
+        'count': count,
+        'mean': float(mean) if mean is not None else 0.0,
+        'variance': float(variance) if variance is not None else 0.0,
+        'stddev': math.sqrt(variance) if variance is not None else 0.0,
+        'min': minimum,
+        'max': maximum,
+        }
+
+
+def age_summary(connection):
+    """Reads the age aggregates kept up to date by `seed.insert_data`, in
+    constant time whatever the size of `user_data`.
+
+    Args:
+        connection (MySQLConnection): Open connection to ALX_prodev.
+
+    Returns:
+        dict: count, mean, variance, stddev, min, max and histogram.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT row_count, age_sum, age_sum_sq, min_age, max_age "
+                   "FROM user_age_summary WHERE id = 1;")
+    row = cursor.fetchone() or (0, 0, 0, None, None)
+    cursor.execute("SELECT bucket, row_count FROM user_age_histogram "
+                   "ORDER BY bucket;")
+    buckets = cursor.fetchall()
+    cursor.close()
+
+    count, total, total_sq, minimum, maximum = row
+    mean = total / count if count else 0.0
+    variance = max(total_sq / count - mean * mean, 0.0) if count else 0.0
+    width = seed.AGE_BUCKET
+    return {
+        'count': count,
+        'mean': mean,
+        'variance': variance,
+        'stddev': math.sqrt(variance),
+        'min': minimum,
+        'max': maximum,
+        'histogram': [((bucket, bucket + width), bucket_count)
+                      for bucket, bucket_count in buckets],
+        }
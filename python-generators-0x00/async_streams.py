@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""Async generator counterparts of the user streaming generators.
+
+Rows are fetched by a producer task into a bounded queue, so a slow
+consumer applies backpressure to the database instead of letting batches
+pile up in memory. The `mysql` driver uses aiomysql against ALX_prodev,
+the `sqlite` driver uses aiosqlite against a local stand-in database.
+"""
+import asyncio
+seed = __import__('seed')
+row_formats = __import__('row_formats')
+
+SQLITE_DATABASE = 'user_data.db'
+USERS_QUERY = "SELECT {} FROM user_data".format(row_formats.USER_SELECT)
+_DONE = object()
+
+
+async def _mysql_batches(query, params, size, database):
+    """Yields batches of dict rows from MySQL on a server side cursor."""
+    import aiomysql
+
+    connection = await aiomysql.connect(
+            host=seed.config['host'], port=int(seed.config['port']),
+            user=seed.config['user'], password=seed.config['password'],
+            db=database or seed.DATABASE)
+    try:
+        async with connection.cursor(aiomysql.SSDictCursor) as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchmany(size)
+            names = tuple(rows[0]) if rows else ()
+            binary_ids = bool(rows) and isinstance(rows[0].get('user_id'),
+                                                   (bytes, bytearray))
+            convert = row_formats.converter('dict', names, binary_ids)
+            while rows:
+                yield list(map(convert, rows)) if convert else rows
+                rows = await cursor.fetchmany(size)
+    finally:
+        connection.close()
+
+
+async def _sqlite_batches(query, params, size, database):
+    """Yields batches of dict rows from a local SQLite database."""
+    import aiosqlite
+
+    async with aiosqlite.connect(database or SQLITE_DATABASE) as connection:
+        connection.row_factory = aiosqlite.Row
+        async with connection.execute(query.replace('%s', '?'),
+                                      params) as cursor:
+            rows = await cursor.fetchmany(size)
+            while rows:
+                yield [dict(row) for row in rows]
+                rows = await cursor.fetchmany(size)
+
+
+DRIVERS = {
+    'mysql': _mysql_batches,
+    'sqlite': _sqlite_batches,
+    }
+
+
+async def _bounded(batches, queue_size):
+    """Runs the <batches> async generator in a producer task, handing its
+    items over through a queue of at most <queue_size> batches.
+    """
+    queue = asyncio.Queue(queue_size)
+
+    async def produce():
+        try:
+            async for batch in batches:
+                await queue.put(batch)
+            await queue.put(_DONE)
+        except Exception as err:
+            await queue.put(err)
+        finally:
+            # When the consumer stops early the producer is cancelled while
+            # <batches> is suspended; close it now so its cursor and
+            # connection are released instead of left to the GC.
+            await batches.aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+def _fetch(query, params=(), size=100, driver='mysql', database=None,
+           queue_size=4):
+    """Streams batches of <query> through a bounded queue."""
+    if driver not in DRIVERS:
+        raise ValueError("Unknown driver: {}".format(driver))
+    batches = DRIVERS[driver](query, params, size, database)
+    return _bounded(batches, queue_size)
+
+
+async def stream_users(driver='mysql', database=None, fetch_size=100,
+                       queue_size=4):
+    """Asynchronously yields rows one by one from the `user_data` table.
+
+    Args:
+        driver (str): `mysql` or `sqlite`.
+        database (str): Database name or SQLite file, defaults per driver.
+        fetch_size (int): Rows pulled from the database per round.
+        queue_size (int): Batches buffered ahead of the consumer.
+    """
+    async for batch in _fetch(USERS_QUERY, (), fetch_size,
+                              driver, database, queue_size):
+        for row in batch:
+            yield row
+
+
+async def stream_users_in_batches(batch_size, driver='mysql', database=None,
+                                  queue_size=4):
+    """Asynchronously yields batches of rows from the `user_data` table.
+
+    Args:
+        batch_size (int): Batch size.
+        driver, database, queue_size: See `stream_users`.
+    """
+    async for batch in _fetch(USERS_QUERY, (), batch_size,
+                              driver, database, queue_size):
+        yield batch
+
+
+async def lazy_pagination(page_size, driver='mysql', database=None,
+                          queue_size=4):
+    """Asynchronously yields pages of `user_data` ordered by `user_id`.
+
+    Args:
+        page_size (int): Size data to fetch.
+        driver, database, queue_size: See `stream_users`.
+    """
+    async for page in _fetch(USERS_QUERY + " ORDER BY user_id", (),
+                             page_size, driver, database, queue_size):
+        yield page
+
+
+async def stream_user_ages(driver='mysql', database=None, fetch_size=100,
+                           queue_size=4):
+    """Asynchronously yields user ages one by one.
+
+    Args:
+        driver, database, fetch_size, queue_size: See `stream_users`.
+    """
+    async for batch in _fetch("SELECT age FROM user_data", (), fetch_size,
+                              driver, database, queue_size):
+        for age in batch:
+            yield age
+
+
+async def _average_age(driver):
+    total_age = 0
+    count = 0
+    async for row in stream_user_ages(driver):
+        total_age += row.get('age')
+        count += 1
+    print("Average age of users: {}".format(total_age / count))
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_average_age(sys.argv[1] if len(sys.argv) > 1 else 'mysql'))
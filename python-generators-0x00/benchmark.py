@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+"""Benchmarks for the user streaming generators.
+
+Usage:
+    ./benchmark.py memory [fetch_size]
+        Peak RSS while streaming 10k to 10M rows from `user_data`.
+    ./benchmark.py schema [lookups]
+        Scan, lookup and size figures before and after migrating
+        `user_data` to the compact schema with `seed.upgrade_table`.
+    ./benchmark.py suite [--sqlite] rows [rows ...]
+        For each table size: generate synthetic users, load them, then time
+        stream_users, batch_processing, lazy_pagination and
+        stream_user_ages (their async variants on the SQLite stand-in with
+        --sqlite), recording throughput and peak RSS.
+"""
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import time
+import traceback
+from itertools import islice
+seed = __import__('seed')
+stream_users = __import__('0-stream_users').stream_users
+batch_processing = __import__('1-batch_processing').batch_processing
+lazy_pagination = __import__('2-lazy_paginate').lazy_pagination
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+async_streams = __import__('async_streams')
+synthetic_data = __import__('synthetic_data')
+
+SCALES = (10_000, 100_000, 1_000_000, 10_000_000)
+SQLITE_DATABASE = 'benchmark.db'
+
+
+def peak_rss():
+    """Returns the peak resident set size of the process in MiB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return usage / (1024 * 1024)
+    return usage / 1024
+
+
+def bench_stream_users(rows, fetch_size=None):
+    """Streams up to <rows> rows and reports throughput and peak RSS.
+
+    Args:
+        rows (int): Number of rows to stream.
+        fetch_size (int): Passed through to `stream_users`.
+
+    Returns:
+        dict: rows streamed, seconds, rows/sec and peak RSS in MiB.
+    """
+    start = time.perf_counter()
+    count = 0
+    for _ in islice(stream_users(fetch_size), rows):
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': count,
+        'seconds': elapsed,
+        'rows_per_sec': count / elapsed if elapsed else 0,
+        'peak_rss_mib': peak_rss(),
+        }
+
+
+def _count_rows(iterable):
+    return sum(1 for _ in iterable)
+
+
+def _count_pages(pages):
+    return sum(len(page) for page in pages)
+
+
+def _run_batch_processing():
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        batch_processing(1000)
+
+
+async def _acount_rows(rows):
+    count = 0
+    async for _ in rows:
+        count += 1
+    return count
+
+
+async def _acount_pages(pages):
+    count = 0
+    async for page in pages:
+        count += len(page)
+    return count
+
+
+MYSQL_CASES = {
+    'stream_users': lambda: _count_rows(stream_users(1000)),
+    'batch_processing': _run_batch_processing,
+    'lazy_pagination': lambda: _count_pages(lazy_pagination(1000, True)),
+    'stream_user_ages': lambda: _count_rows(stream_user_ages()),
+    }
+SQLITE_CASES = {
+    'stream_users': lambda: asyncio.run(_acount_rows(
+        async_streams.stream_users('sqlite', SQLITE_DATABASE, 1000))),
+    'stream_users_in_batches': lambda: asyncio.run(_acount_pages(
+        async_streams.stream_users_in_batches(1000, 'sqlite',
+                                              SQLITE_DATABASE))),
+    'lazy_pagination': lambda: asyncio.run(_acount_pages(
+        async_streams.lazy_pagination(1000, 'sqlite', SQLITE_DATABASE))),
+    'stream_user_ages': lambda: asyncio.run(_acount_rows(
+        async_streams.stream_user_ages('sqlite', SQLITE_DATABASE, 1000))),
+    }
+
+
+def _measure(case, results):
+    try:
+        start = time.perf_counter()
+        case()
+        results.put((time.perf_counter() - start, peak_rss()))
+    except BaseException:
+        # Sent as text: the exception itself may not pickle.
+        results.put(traceback.format_exc())
+
+
+def measure(case):
+    """Runs <case> in a fresh process so every measurement starts from the
+    same baseline RSS.
+
+    Returns:
+        tuple: (seconds, peak RSS in MiB)
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(case, results))
+    process.start()
+    while True:
+        alive = process.is_alive()
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            # Checked before the get: a result sent just before exiting is
+            # still read.
+            if not alive:
+                raise RuntimeError("Benchmark process died with exit code "
+                                   "{}".format(process.exitcode))
+    process.join()
+    if isinstance(result, str):
+        raise RuntimeError("Benchmark case failed:\n" + result)
+    return result
+
+
+def bench_schema(lookups=1000):
+    """Times an age scan, <lookups> email lookups and a keyset walk of
+    `user_data`, and reads the table and index sizes.
+
+    Returns:
+        dict: seconds per workload and sizes in MiB.
+    """
+    results = {}
+    with seed.pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT email FROM user_data ORDER BY RAND() LIMIT %s",
+                       (lookups,))
+        emails = [row[0] for row in cursor.fetchall()]
+
+        start = time.perf_counter()
+        cursor.execute("SELECT AVG(age) FROM user_data;")
+        cursor.fetchall()
+        results['age_scan'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for email in emails:
+            cursor.execute("SELECT * FROM user_data WHERE email = %s",
+                           (email,))
+            cursor.fetchall()
+        results['email_lookups'] = time.perf_counter() - start
+
+        cursor.execute("ANALYZE TABLE user_data;")
+        cursor.fetchall()
+        cursor.execute(
+                "SELECT DATA_LENGTH, INDEX_LENGTH "
+                "FROM information_schema.TABLES WHERE "
+                "TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data';")
+        data_length, index_length = cursor.fetchone()
+        results['data_mib'] = data_length / (1024 * 1024)
+        results['index_mib'] = index_length / (1024 * 1024)
+        cursor.close()
+
+    start = time.perf_counter()
+    _count_pages(lazy_pagination(1000, True))
+    results['keyset_walk'] = time.perf_counter() - start
+    return results
+
+
+def _reset_mysql_table():
+    with seed.pooled_connection() as connection:
+        seed.drop_table(connection)
+
+
+def run_suite(scales, sqlite=False, path='benchmark_users.csv'):
+    """Benchmarks every streaming function at each table size in <scales>.
+
+    Args:
+        scales (list): Table sizes in rows.
+        sqlite (bool): Benchmark the async variants against a local SQLite
+            stand-in instead of MySQL.
+        path (str): Scratch csv file for the synthetic users.
+    """
+    cases = SQLITE_CASES if sqlite else MYSQL_CASES
+    print("{:>12} {:<24} {:>10} {:>12} {:>14}".format(
+        'rows', 'function', 'seconds', 'rows/sec', 'peak RSS MiB'))
+    try:
+        for rows in scales:
+            synthetic_data.generate(path, rows)
+            if sqlite:
+                synthetic_data.load_sqlite(path, SQLITE_DATABASE)
+            else:
+                _reset_mysql_table()
+                synthetic_data.load_mysql(path)
+            for name, case in cases.items():
+                seconds, rss = measure(case)
+                print("{:>12} {:<24} {:>10.2f} {:>12.0f} {:>14.1f}".format(
+                    rows, name, seconds, rows / seconds if seconds else 0,
+                    rss))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'memory'
+    if command == 'schema':
+        lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        before = bench_schema(lookups)
+        with seed.pooled_connection() as connection:
+            seed.upgrade_table(connection)
+        after = bench_schema(lookups)
+        print("{:<16} {:>10} {:>10}".format('', 'before', 'after'))
+        for key in before:
+            print("{:<16} {:>10.2f} {:>10.2f}".format(
+                key, before[key], after[key]))
+        sys.exit(0)
+    if command == 'suite':
+        arguments = sys.argv[2:]
+        use_sqlite = '--sqlite' in arguments
+        scales = [int(arg) for arg in arguments if arg != '--sqlite']
+        run_suite(scales or SCALES[:3], use_sqlite)
+        sys.exit(0)
+
+    fetch_size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print("{:>12} {:>10} {:>12} {:>14}".format(
+        'rows', 'seconds', 'rows/sec', 'peak RSS MiB'))
+    # Scales run in ascending order: ru_maxrss never decreases, so a flat
+    # column means streaming memory does not grow with the row count.
+    for scale in SCALES:
+        result = bench_stream_users(scale, fetch_size)
+        print("{rows:>12} {seconds:>10.2f} {rows_per_sec:>12.0f} "
+              "{peak_rss_mib:>14.1f}".format(**result))
+        if result['rows'] < scale:
+            break
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+"""Optional instrumentation for the user streaming generators.
+
+Functions decorated with `instrument` accept two extra keyword arguments:
+
+    stats (StreamStats): Collects rows, batches, estimated bytes, time
+        blocked fetching and time suspended at `yield` (consumer time).
+    log_interval (int, float): Seconds between progress log lines on the
+        `user_streams` logger.
+
+When neither is passed the plain generator is returned untouched.
+"""
+import functools
+import logging
+import time
+prefetching = __import__('prefetching')
+
+logger = logging.getLogger('user_streams')
+
+
+class StreamStats():
+    """Counters for one run of a streaming generator."""
+    def __init__(self, name='stream'):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.bytes = 0
+        self.fetch_seconds = 0.0
+        self.consumer_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        """Seconds since the first fetch, up to the end of the stream."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_sec(self):
+        """Rows streamed per second of elapsed time."""
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed else 0.0
+
+    def as_dict(self):
+        """Returns the counters as a dict."""
+        return {
+            'name': self.name,
+            'rows': self.rows,
+            'batches': self.batches,
+            'bytes': self.bytes,
+            'fetch_seconds': self.fetch_seconds,
+            'consumer_seconds': self.consumer_seconds,
+            'elapsed': self.elapsed,
+            'rows_per_sec': self.rows_per_sec,
+            }
+
+    def __str__(self):
+        return ("{name}: {rows} rows in {batches} batches, {kib:.0f} KiB, "
+                "{rows_per_sec:.0f} rows/s, fetch {fetch_seconds:.3f}s, "
+                "consumer {consumer_seconds:.3f}s").format(
+                    kib=self.bytes / 1024, **self.as_dict())
+
+
+def _measure(item):
+    """Returns (rows, batches, estimated bytes) for one yielded item."""
+    if isinstance(item, list):
+        return len(item), 1, prefetching.sizeof(item)
+    if prefetching.is_columnar(item):
+        column = next(iter(item.values()))
+        return len(column), 1, prefetching.sizeof(item)
+    return 1, 0, prefetching.row_size(item)
+
+
+def _instrumented(stream, stats, log_interval):
+    """Re-yields <stream>, timing each fetch and each consumer pause."""
+    clock = time.perf_counter
+    next_log = None
+    try:
+        while True:
+            start = clock()
+            if stats.started is None:
+                stats.started = start
+                if log_interval:
+                    next_log = start + log_interval
+            try:
+                item = next(stream)
+            except StopIteration:
+                break
+            fetched = clock()
+            stats.fetch_seconds += fetched - start
+            rows, batches, nbytes = _measure(item)
+            stats.rows += rows
+            stats.batches += batches
+            stats.bytes += nbytes
+            yield item
+            resumed = clock()
+            stats.consumer_seconds += resumed - fetched
+            if next_log is not None and resumed >= next_log:
+                logger.info("%s", stats)
+                next_log = resumed + log_interval
+    finally:
+        stream.close()
+        stats.finished = clock()
+        if log_interval:
+            logger.info("%s (done)", stats)
+
+
+def instrument(func):
+    """Adds the optional `stats` and `log_interval` keyword arguments to a
+    generator function.
+    """
+    @functools.wraps(func)
+    def wrapper_instrument(*args, stats=None, log_interval=None, **kwargs):
+        stream = func(*args, **kwargs)
+        if stats is None and not log_interval:
+            return stream
+        if stats is None:
+            stats = StreamStats(func.__name__)
+        return _instrumented(stream, stats, log_interval)
+    return wrapper_instrument
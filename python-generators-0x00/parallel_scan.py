@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+"""Scans the `user_data` table in parallel by splitting it into `user_id`
+key ranges, each streamed on its own connection in a worker process.
+"""
+import functools
+import os
+from multiprocessing import Pool
+seed = __import__('seed')
+row_formats = __import__('row_formats')
+
+# CHAR(36) user_id values are random (version 4) UUIDs, so their leading
+# hex digits are uniformly distributed and even splits of that space give
+# even ranges.
+KEY_SPACE = 16 ** 8
+
+
+def key_ranges(partitions, connection=None):
+    """Splits the `user_id` key space into <partitions> ranges.
+
+    Time ordered BINARY(16) keys are not uniform, so for that schema the
+    span between the smallest and largest key read through <connection>
+    is split instead.
+
+    Args:
+        partitions (int): Number of ranges.
+        connection (MySQLConnection): Open connection used to detect the
+            schema, text keys are assumed when None.
+
+    Returns:
+        list: (low, high) pairs; None means unbounded.
+    """
+    bounds = [None]
+    if connection is not None and seed.uses_binary_ids(connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM user_data;")
+        low, high = cursor.fetchone()
+        cursor.close()
+        if low is None:
+            return [(None, None)]
+        low, high = int.from_bytes(low, 'big'), int.from_bytes(high, 'big')
+        for i in range(1, partitions):
+            bounds.append(
+                    (low + (high - low) * i // partitions).to_bytes(16, 'big'))
+    else:
+        for i in range(1, partitions):
+            bounds.append("{:08x}".format(KEY_SPACE * i // partitions))
+    bounds.append(None)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def scan_range(key_range, batch_size=1000):
+    """Yields batches of rows whose `user_id` falls in <key_range>.
+
+    Args:
+        key_range (tuple): (low, high) pair from `key_ranges`.
+        batch_size (int): Rows fetched per round trip.
+    """
+    low, high = key_range
+    conditions, params = [], []
+    if low is not None:
+        conditions.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("user_id < %s")
+        params.append(high)
+    query = "SELECT {} FROM user_data".format(row_formats.USER_SELECT)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    with seed.pooled_connection() as connection:
+        binary_ids = seed.uses_binary_ids(connection)
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, tuple(params))
+        convert = row_formats.converter('dict', cursor.column_names,
+                                        binary_ids)
+        batch = cursor.fetchmany(batch_size)
+        while batch:
+            yield list(map(convert, batch)) if convert else batch
+            batch = cursor.fetchmany(batch_size)
+
+
+def _scan_worker(key_range, mapper, combiner, initial, batch_size):
+    """Reduces one key range inside a worker process."""
+    result = initial
+    for batch in scan_range(key_range, batch_size):
+        result = combiner(result, mapper(batch))
+    return result
+
+
+def parallel_scan(mapper, combiner, initial, partitions=None,
+                  batch_size=1000):
+    """Maps every batch of the table through <mapper> in worker processes
+    and merges the partial results with <combiner>.
+
+    <mapper> and <combiner> run in other processes, so they must be
+    picklable, i.e. defined at module level.
+
+    Args:
+        mapper (callable): Takes a list of rows, returns a partial result.
+        combiner (callable): Merges two partial results.
+        initial: Identity value every reduction starts from.
+        partitions (int): Number of key ranges and worker processes,
+            defaults to the number of CPUs.
+        batch_size (int): Rows fetched per round trip.
+
+    Returns:
+        The combined result of all partitions.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    worker = functools.partial(_scan_worker, mapper=mapper,
+                               combiner=combiner, initial=initial,
+                               batch_size=batch_size)
+    with seed.pooled_connection() as connection:
+        ranges = key_ranges(partitions, connection)
+    with Pool(partitions) as pool:
+        partials = pool.map(worker, ranges)
+    result = initial
+    for partial in partials:
+        result = combiner(result, partial)
+    return result
+
+
+def _filter_over_25(batch):
+    return [user for user in batch if user.get('age') > 25]
+
+
+def _concat(left, right):
+    return left + right
+
+
+def _filter_batch(predicate, batch):
+    return [row for row in batch if predicate(row)]
+
+
+def parallel_filter(predicate, partitions=None, batch_size=1000):
+    """Returns every row matching <predicate>, scanning in parallel.
+
+    Args:
+        predicate (callable): Module level function taking a row.
+        partitions (int): Number of key ranges and worker processes.
+        batch_size (int): Rows fetched per round trip.
+    """
+    mapper = functools.partial(_filter_batch, predicate)
+    return parallel_scan(mapper, _concat, [], partitions, batch_size)
+
+
+if __name__ == "__main__":
+    users = parallel_scan(_filter_over_25, _concat, [])
+    print("Users over 25: {}".format(len(users)))
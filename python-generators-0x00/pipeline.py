@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""Chains filter, map, chunk, window and reduce stages over the user
+streaming generators without a generator frame per stage.
+
+Adjacent filter and map stages are fused into one generated loop, and
+items move through the stages a whole block at a time: each batch when
+the source is `stream_users_in_batches` or `lazy_pagination`, blocks of
+<block_size> items otherwise.
+
+    over_25 = (Pipeline.from_batches(stream_users_in_batches(1000))
+               .filter(lambda user: user['age'] > 25)
+               .map(lambda user: user['email'])
+               .chunk(100))
+    for emails in over_25:
+        ...
+"""
+import collections
+import functools
+from itertools import islice
+
+
+def _fuse(operations):
+    """Compiles a run of ('filter' | 'map', func) operations into a single
+    function mapping a list of items to the list of results.
+    """
+    lines = ["def run({}, items):".format(
+                ', '.join('f{}'.format(i) for i in range(len(operations)))),
+             "    out = []",
+             "    append = out.append",
+             "    for item in items:"]
+    for i, (kind, _) in enumerate(operations):
+        if kind == 'filter':
+            lines.append("        if not f{}(item):".format(i))
+            lines.append("            continue")
+        else:
+            lines.append("        item = f{}(item)".format(i))
+    lines.append("        append(item)")
+    lines.append("    return out")
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return functools.partial(namespace['run'],
+                             *(func for _, func in operations))
+
+
+class _Fused():
+    """A stateless run of filter and map operations."""
+    def __init__(self, operations):
+        self.process = _fuse(operations)
+
+    def finish(self):
+        return []
+
+
+class _Chunk():
+    """Groups items into lists of <size>; the last one may be shorter."""
+    def __init__(self, size):
+        self.size = size
+        self.pending = []
+
+    def process(self, items):
+        self.pending.extend(items)
+        size = self.size
+        full = len(self.pending) - len(self.pending) % size
+        out = [self.pending[i:i + size] for i in range(0, full, size)]
+        del self.pending[:full]
+        return out
+
+    def finish(self):
+        out, self.pending = ([self.pending] if self.pending else []), []
+        return out
+
+
+class _Window():
+    """Sliding windows of <size> items, advancing <step> items at a time."""
+    def __init__(self, size, step):
+        self.size = size
+        self.step = step
+        self.window = collections.deque(maxlen=size)
+        self.skip = 0
+
+    def process(self, items):
+        out = []
+        for item in items:
+            self.window.append(item)
+            if len(self.window) < self.size:
+                continue
+            if self.skip:
+                self.skip -= 1
+                continue
+            out.append(tuple(self.window))
+            self.skip = self.step - 1
+        return out
+
+    def finish(self):
+        return []
+
+
+class Pipeline():
+    """A lazily evaluated chain of stages over a row or batch source."""
+    def __init__(self, source, batched=False, block_size=1024):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            source (iterable): Rows, or batches of rows if <batched>.
+            batched (bool): Whether <source> yields lists of rows.
+            block_size (int): Rows processed at a time when not batched.
+        """
+        self.source = source
+        self.batched = batched
+        self.block_size = block_size
+        self.__operations = []
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Builds a pipeline over a source of batches, processing each
+        fetched batch as one block.
+        """
+        return cls(batches, batched=True)
+
+    def __add(self, operation):
+        pipeline = Pipeline(self.source, self.batched, self.block_size)
+        pipeline.__operations = self.__operations + [operation]
+        return pipeline
+
+    def filter(self, predicate):
+        """Keeps the items for which <predicate> is true."""
+        return self.__add(('filter', predicate))
+
+    def map(self, func):
+        """Replaces each item with func(item)."""
+        return self.__add(('map', func))
+
+    def chunk(self, size):
+        """Groups items into lists of <size>."""
+        return self.__add(('chunk', size))
+
+    def window(self, size, step=1):
+        """Yields tuples of <size> consecutive items, <step> apart."""
+        return self.__add(('window', (size, step)))
+
+    def __stages(self):
+        stages, run = [], []
+        for kind, argument in self.__operations:
+            if kind in ('filter', 'map'):
+                run.append((kind, argument))
+                continue
+            if run:
+                stages.append(_Fused(run))
+                run = []
+            if kind == 'chunk':
+                stages.append(_Chunk(argument))
+            else:
+                stages.append(_Window(*argument))
+        if run:
+            stages.append(_Fused(run))
+        return stages
+
+    def __blocks(self):
+        if self.batched:
+            yield from self.source
+            return
+        source = iter(self.source)
+        block = list(islice(source, self.block_size))
+        while block:
+            yield block
+            block = list(islice(source, self.block_size))
+
+    def batches(self):
+        """Yields the output a block at a time, e.g. to feed a sink."""
+        stages = self.__stages()
+        for block in self.__blocks():
+            for stage in stages:
+                block = stage.process(block)
+            if block:
+                yield block
+        for i, stage in enumerate(stages):
+            block = stage.finish()
+            for later in stages[i + 1:]:
+                block = later.process(block)
+            if block:
+                yield block
+
+    def __iter__(self):
+        for block in self.batches():
+            yield from block
+
+    def reduce(self, func, initial):
+        """Folds every output item into <initial> with func(acc, item)."""
+        result = initial
+        for block in self.batches():
+            result = functools.reduce(func, block, result)
+        return result
+
+    def collect(self):
+        """Returns every output item in a list."""
+        return list(self)
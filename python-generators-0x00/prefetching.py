@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""Prefetches batches or pages on a background thread so database latency
+overlaps with the time the consumer spends processing.
+"""
+import collections
+import sys
+import threading
+
+
+def row_size(row):
+    """Estimates the memory held by one row in bytes, whatever its format."""
+    size = sys.getsizeof(row)
+    if isinstance(row, dict):
+        values = row.values()
+    elif isinstance(row, (tuple, list)):
+        values = row
+    elif hasattr(row, '__slots__'):
+        values = [getattr(row, name, None) for name in row.__slots__]
+    else:
+        return size
+    for value in values:
+        size += sys.getsizeof(value)
+    return size
+
+
+def is_columnar(batch):
+    """Tells whether <batch> is a dict of arrays, one per column."""
+    return isinstance(batch, dict) and bool(batch) and \
+        all(hasattr(column, 'nbytes') for column in batch.values())
+
+
+def sizeof(batch):
+    """Estimates the memory held by a batch of rows, or by a columnar
+    batch, in bytes.
+    """
+    if is_columnar(batch):
+        return sum(column.nbytes for column in batch.values())
+    return sys.getsizeof(batch) + sum(map(row_size, batch))
+
+
+def prefetch(batches, depth=1, max_bytes=None):
+    """Iterates <batches> on a background thread, keeping up to <depth>
+    batches ready ahead of the consumer.
+
+    The producer only starts fetching a batch when fewer than <depth>
+    batches are waiting, so at most <depth> batches are held ahead of the
+    one the consumer is processing. With depth=1 this is double
+    buffering: batch k+1 is fetched while batch k is being processed.
+
+    Args:
+        batches (iterable): Source of batches, e.g. `stream_users_in_batches`
+            or `lazy_pagination`.
+        depth (int): Maximum number of batches fetched ahead.
+        max_bytes (int): No new batch is fetched while the batches held
+            ahead are estimated at this size or more; the last one fetched
+            may take the total over it.
+    """
+    buffer = collections.deque()
+    condition = threading.Condition()
+    state = {'bytes': 0, 'done': False, 'stop': False, 'error': None}
+
+    def produce():
+        source = iter(batches)
+        end = object()
+        try:
+            while True:
+                # Wait for room before fetching, so the batch being fetched
+                # counts against <depth> and <max_bytes>.
+                with condition:
+                    while not state['stop'] and (
+                            len(buffer) >= depth or
+                            (max_bytes and state['bytes'] >= max_bytes)):
+                        condition.wait()
+                    if state['stop']:
+                        break
+                batch = next(source, end)
+                if batch is end:
+                    break
+                size = sizeof(batch) if max_bytes else 0
+                with condition:
+                    buffer.append((batch, size))
+                    state['bytes'] += size
+                    condition.notify_all()
+        except BaseException as err:
+            state['error'] = err
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+            with condition:
+                state['done'] = True
+                condition.notify_all()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            with condition:
+                while not buffer and not state['done']:
+                    condition.wait()
+                if not buffer:
+                    break
+                batch, size = buffer.popleft()
+                state['bytes'] -= size
+                condition.notify_all()
+            yield batch
+        if state['error'] is not None:
+            raise state['error']
+    finally:
+        with condition:
+            state['stop'] = True
+            condition.notify_all()
+        producer.join()
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+"""Filter and projection specs for the user streaming generators.
+
+A `QuerySpec` compiles what it can into a parameterized `SELECT` so rows
+are filtered by MySQL before they cross the wire. Conditions that cannot
+be expressed in SQL are applied to the fetched rows in Python.
+
+    spec = QuerySpec(columns=['name', 'age'],
+                     where=[('age', '>', 25),
+                            ('email', 'endswith', '@gmail.com'),
+                            ('name', lambda name: name.istitle())])
+"""
+row_formats = __import__('row_formats')
+
+COLUMNS = ('user_id', 'name', 'email', 'age', 'seq')
+OPERATORS = {
+    '=': '=',
+    '!=': '<>',
+    '<': '<',
+    '<=': '<=',
+    '>': '>',
+    '>=': '>=',
+    'in': 'IN',
+    'startswith': 'LIKE',
+    'endswith': 'LIKE',
+    'contains': 'LIKE',
+    }
+
+
+def _like(op, value):
+    """Escapes <value> into a LIKE pattern for <op>."""
+    for char in ('\\', '%', '_'):
+        value = value.replace(char, '\\' + char)
+    if op == 'startswith':
+        return value + '%'
+    if op == 'endswith':
+        return '%' + value
+    return '%' + value + '%'
+
+
+class QuerySpec():
+    """Columns to fetch and conditions rows must satisfy."""
+    def __init__(self, columns=None, where=(), predicate=None):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            columns (list): Columns to fetch, all of them when None.
+            where (list): Conditions that must all hold. Either
+                (column, op, value) with an op from `OPERATORS`, or
+                (column, callable) tested in Python.
+            predicate (callable): Extra test applied in Python to each
+                fetched row.
+        """
+        if columns is not None:
+            for column in columns:
+                if column not in COLUMNS:
+                    raise ValueError("Unknown column: {}".format(column))
+        self.columns = list(columns) if columns is not None else None
+        self.predicate = predicate
+        self.__pushed, self.__residual = [], []
+        for condition in where:
+            if len(condition) == 3 and condition[0] in COLUMNS and \
+                    condition[1] in OPERATORS:
+                self.__pushed.append(tuple(condition))
+            elif len(condition) == 2 and condition[0] in COLUMNS and \
+                    callable(condition[1]):
+                self.__residual.append(tuple(condition))
+            else:
+                raise ValueError("Invalid condition: {!r}".format(condition))
+        # Columns fetched only for the Python side conditions; they follow
+        # the requested ones and are dropped once rows are filtered.
+        selected = self.columns if self.columns is not None \
+            else row_formats.USER_COLUMNS
+        self.__extra = []
+        for column, _ in self.__residual:
+            if column not in selected and column not in self.__extra:
+                self.__extra.append(column)
+
+    def compile(self, table='user_data'):
+        """Returns the (query, params) pair selecting the rows of <table>
+        that satisfy every condition that can be pushed down.
+        """
+        columns = list(self.columns if self.columns is not None
+                       else row_formats.USER_COLUMNS) + self.__extra
+        select = ', '.join('`{}`'.format(column) for column in columns)
+
+        clauses, params = [], []
+        for column, op, value in self.__pushed:
+            sql_op = OPERATORS[op]
+            if op == 'in':
+                values = list(value)
+                if not values:
+                    clauses.append('FALSE')
+                    continue
+                clauses.append('`{}` IN ({})'.format(
+                    column, ', '.join(['%s'] * len(values))))
+                params.extend(values)
+            elif sql_op == 'LIKE':
+                clauses.append('`{}` LIKE %s'.format(column))
+                params.append(_like(op, value))
+            else:
+                clauses.append('`{}` {} %s'.format(column, sql_op))
+                params.append(value)
+
+        query = "SELECT {} FROM {}".format(select, table)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return query, tuple(params)
+
+    def check_format(self, row_format):
+        """Raises ValueError when <row_format> cannot hold the columns the
+        spec fetches: `UserRow` has no `seq` slot.
+        """
+        if row_format != 'slots':
+            return
+        columns = (self.columns or []) + self.__extra
+        for column in columns:
+            if column not in row_formats.UserRow.__slots__:
+                raise ValueError("Column {} is not available with the slots "
+                                 "row format.".format(column))
+
+    def output_columns(self, column_names):
+        """Returns <column_names> without the columns fetched only for the
+        Python side conditions.
+        """
+        return column_names[:len(column_names) - len(self.__extra)]
+
+    def strip(self, row, column_names):
+        """Drops the columns fetched only for the Python side conditions
+        from <row>.
+        """
+        if not self.__extra:
+            return row
+        if isinstance(row, dict):
+            for column in self.__extra:
+                del row[column]
+            return row
+        if isinstance(row, row_formats.UserRow):
+            for column in self.__extra:
+                setattr(row, column, None)
+            return row
+        kept = len(column_names) - len(self.__extra)
+        if type(row) is tuple:
+            return row[:kept]
+        return row_formats.namedtuple_type(tuple(column_names[:kept]))._make(
+                row[:kept])
+
+    def filter(self, rows, column_names):
+        """Returns the <rows> that satisfy the Python side conditions,
+        stripped of the columns fetched only to test them, or <rows>
+        itself when everything was pushed down.
+
+        Args:
+            rows (list): Rows in any of the `row_formats`.
+            column_names (tuple): Columns of the executed query.
+        """
+        if not self.pushed_down:
+            return [self.strip(row, column_names) for row in rows
+                    if self.matches(row, column_names)]
+        return rows
+
+    @property
+    def pushed_down(self):
+        """True when every condition is applied by the server."""
+        return not self.__residual and self.predicate is None
+
+    def matches(self, row, column_names):
+        """Tests <row> against the Python side conditions."""
+        for column, test in self.__residual:
+            if not test(row_formats.field(row, column, column_names)):
+                return False
+        return self.predicate is None or self.predicate(row)
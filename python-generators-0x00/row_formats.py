@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""Row formats for the user streaming generators.
+
+    dict        {'user_id': ..., 'name': ..., ...} (the default)
+    tuple       plain tuples in column order
+    namedtuple  namedtuples with the query's columns as fields
+    slots       `UserRow` instances
+
+BINARY(16) user ids, see `seed.upgrade_table`, are returned as UUID text
+in every format.
+"""
+import collections
+import functools
+from uuid import UUID
+
+ROW_FORMATS = ('dict', 'tuple', 'namedtuple', 'slots')
+# Columns the streams return; `seq` is internal, see `5-tail_users`.
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+USER_SELECT = ', '.join(USER_COLUMNS)
+
+
+class UserRow():
+    """A `user_data` row without a per instance __dict__."""
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id=None, name=None, email=None, age=None):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __repr__(self):
+        return "UserRow(user_id={!r}, name={!r}, email={!r}, age={!r})".format(
+                self.user_id, self.name, self.email, self.age)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def as_dict(self):
+        """Returns the row as a dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def cursor_for(connection, row_format='dict', **options):
+    """Opens a cursor on <connection> suited to <row_format>.
+
+    Args:
+        connection (MySQLConnection): Open connection to ALX_prodev.
+        row_format (str): One of `ROW_FORMATS`.
+        options: Extra cursor options, e.g. buffered=False.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError("Unknown row format: {}".format(row_format))
+    if row_format == 'dict':
+        return connection.cursor(dictionary=True, **options)
+    # Namedtuple rows are built by `converter`: the cursor's named_tuple
+    # option is gone from Connector/Python 9.3.
+    return connection.cursor(**options)
+
+
+def format_user_id(user_id):
+    """Returns <user_id> as UUID text whichever schema it was read from."""
+    if isinstance(user_id, (bytes, bytearray)):
+        return str(UUID(bytes=bytes(user_id)))
+    return user_id
+
+
+@functools.lru_cache(maxsize=32)
+def namedtuple_type(column_names):
+    """Returns the namedtuple class for rows of <column_names>, built once
+    per column list rather than once per query.
+    """
+    return collections.namedtuple('UserRow', column_names)
+
+
+def converter(row_format, column_names, binary_ids=False):
+    """Returns a function turning cursor rows into <row_format>, or None
+    when the cursor already returns that format.
+
+    Args:
+        row_format (str): One of `ROW_FORMATS`.
+        column_names (tuple): Columns of the executed query.
+        binary_ids (bool): Whether `user_id` is stored as BINARY(16), see
+            `seed.uses_binary_ids`; it is then turned into UUID text.
+    """
+    convert = None
+    if row_format == 'slots':
+        indexes = [column_names.index(name) if name in column_names
+                   else None for name in UserRow.__slots__]
+        if indexes == list(range(len(UserRow.__slots__))):
+            convert = lambda row: UserRow(*row[:len(indexes)])
+        else:
+            convert = lambda row: UserRow(*(None if i is None else row[i]
+                                            for i in indexes))
+    elif row_format == 'namedtuple':
+        convert = namedtuple_type(tuple(column_names))._make
+    if not binary_ids or 'user_id' not in column_names:
+        return convert
+
+    if row_format == 'slots':
+        def convert_ids(row):
+            row = convert(row)
+            row.user_id = format_user_id(row.user_id)
+            return row
+    elif row_format == 'dict':
+        def convert_ids(row):
+            row['user_id'] = format_user_id(row['user_id'])
+            return row
+    else:
+        index = column_names.index('user_id')
+
+        def convert_ids(row):
+            row = (row[:index] + (format_user_id(row[index]),) +
+                   row[index + 1:])
+            return convert(row) if convert else row
+    return convert_ids
+
+
+def field(row, name, column_names):
+    """Returns the <name> field of <row> whatever its format."""
+    if isinstance(row, dict):
+        return row[name]
+    if type(row) is tuple:
+        return row[column_names.index(name)]
+    return getattr(row, name)
@@ -2,9 +2,16 @@
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
 from mysql.connector.connection_cext import CMySQLConnection
+from contextlib import contextmanager
+from multiprocessing import Pool
 from uuid import uuid4
 import csv
+import mmap
 import os
+import queue
+import tempfile
+import threading
+import time
 
 config = {
         'host': os.getenv('DB_HOST'),
@@ -12,12 +19,19 @@ config = {
         'password': os.getenv('DB_PASSWD'),
         'port': os.getenv('DB_PORT')
         }
+DATABASE = 'ALX_prodev'
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
 
-def connect_db():
-    """Connects to a MySQL Database Server."""
+def connect_db(**options):
+    """Connects to a MySQL Database Server.
+
+    Args:
+        options: Extra connection options merged into `config`
+            e.g. allow_local_infile=True for LOAD DATA LOCAL INFILE.
+    """
     if not all(config.values()):
         raise EnvironmentError("Some required environmental variables missing.")
-    connection = mysql.connector.connect(**config)
+    connection = mysql.connector.connect(**config, **options)
     return connection
 
 def create_database(connection):
@@ -40,61 +54,625 @@ def create_database(connection):
 
 def connect_to_prodev():
     """Connects to the ALX_prodev database in MySQL."""
-    connection = connect_db()
-    cursor = connection.cursor()
-    cursor.execute("USE ALX_prodev;")
-    return connection
+    return connect_db(database=DATABASE)
 
-def create_table(connection):
-    """Creates a table [user_data] if it does not exists.
-        - user_id(Primary Key, UUID, Indexed
-        - name (VARCHAR, NOT NULL)
-        - email (VARCHAR, NOT NULL)
-        - age (INT, NOT NULL)
+
+class ConnectionPool():
+    """A fixed size pool of connections to the ALX_prodev database.
+
+    Connections are opened lazily, reused most recently released first and
+    pinged before reuse when they have been idle longer than
+    <health_check_interval> seconds.
     """
-    if isinstance(connection, (MySQLConnection, CMySQLConnection)):
-        queryStr = """
-        CREATE TABLE IF NOT EXISTS `user_data` (
-        user_id CHAR(36) PRIMARY KEY,
+    def __init__(self, size=POOL_SIZE, health_check_interval=30, **options):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            size (int): Maximum number of open connections.
+            health_check_interval (int, float): Idle seconds after which a
+                connection is pinged before being handed out.
+            options: Extra options passed to `connect_db`.
+        """
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.__options = dict(options, database=DATABASE)
+        self.__idle = queue.LifoQueue()
+        self.__slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout=None):
+        """Returns a healthy connection, waiting up to <timeout> seconds
+        for one to be released when all <size> are in use.
+        """
+        if not self.__slots.acquire(timeout=timeout):
+            raise mysql.connector.errors.PoolError(
+                    "No connection available in the pool.")
+        try:
+            try:
+                connection, released = self.__idle.get_nowait()
+            except queue.Empty:
+                return connect_db(**self.__options)
+            idle = time.monotonic() - released
+            if idle > self.health_check_interval and \
+                    not connection.is_connected():
+                connection.close()
+                return connect_db(**self.__options)
+            return connection
+        except BaseException:
+            self.__slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Returns <connection> to the pool, or closes it if <discard>."""
+        try:
+            if discard:
+                connection.close()
+                return
+            if connection.in_transaction:
+                connection.rollback()
+            self.__idle.put((connection, time.monotonic()))
+        except mysql.connector.Error:
+            connection.close()
+        finally:
+            self.__slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Lends a connection for the duration of a `with` block. The
+        connection is discarded if the block raises, including when a
+        generator holding it is closed early.
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        self.release(connection)
+
+    def close(self):
+        """Closes every idle connection."""
+        while True:
+            try:
+                connection, _ = self.__idle.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Pools inherited by forked children. They are kept referenced, never used
+# nor freed: freeing a connection closes it, which sends COM_QUIT on the
+# socket the parent still uses.
+_inherited_pools = []
+
+
+def get_pool():
+    """Returns the process wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def pooled_connection():
+    """Lends a connection from the process wide pool:
+
+        with seed.pooled_connection() as connection:
+            ...
+    """
+    return get_pool().connection()
+
+
+def _reset_pool():
+    """Sets the parent's pool aside in a forked child so sockets are never
+    shared between processes; the child opens a fresh pool on first use.
+    """
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_pool)
+
+USER_INDEXES = {
+    'idx_user_data_age': '(age)',
+    'idx_user_data_email': '(email)',
+    }
+
+
+def _table_ddl(table, binary_ids):
+    """Returns the CREATE TABLE statement of the `user_data` schema."""
+    indexes = ''.join(',\n        INDEX {} {}'.format(name, columns)
+                      for name, columns in USER_INDEXES.items())
+    return """
+        CREATE TABLE IF NOT EXISTS `{}` (
+        user_id {} PRIMARY KEY,
         name VARCHAR(256) NOT NULL,
         email VARCHAR(256) NOT NULL,
-        age INT NOT NULL
+        age INT NOT NULL,
+        seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE{}
         ) ENGINE=InnoDB;
-        """
+        """.format(table, 'BINARY(16)' if binary_ids else 'CHAR(36)', indexes)
+
+
+def create_table(connection, binary_ids=False):
+    """Creates a table [user_data] if it does not exists.
+        - user_id (Primary Key, UUID, Indexed)
+        - name (VARCHAR, NOT NULL)
+        - email (VARCHAR, NOT NULL, Indexed)
+        - age (INT, NOT NULL, Indexed)
+        - seq (BIGINT, AUTO_INCREMENT, Unique) insertion order
+
+    Args:
+        connection (MySQLConnection): A MySQL Database - ALX_prodev
+        binary_ids (bool): Store user_id as a BINARY(16) time ordered UUID
+            instead of CHAR(36) text.
+    """
+    if isinstance(connection, (MySQLConnection, CMySQLConnection)):
+        created = not _has_table(connection, 'user_data')
         cursor = connection.cursor()
-        cursor.execute(queryStr)
+        cursor.execute(_table_ddl('user_data', binary_ids))
         connection.commit()
+        if created:
+            # Zeroes any summary left from a dropped user_data table.
+            reconcile_age_summary(connection)
+        else:
+            # Brings a table from before `seq` existed up to date.
+            add_sequence_column(connection)
+            create_summary_tables(connection)
         print("Table user_data created successfully")
 
-def insert_data(connection, data):
+
+def drop_table(connection):
+    """Drops the `user_data` table together with its age summary."""
+    cursor = connection.cursor()
+    cursor.execute("DROP TABLE IF EXISTS user_data, user_age_summary, "
+                   "user_age_histogram;")
+    connection.commit()
+    cursor.close()
+
+
+AGE_BUCKET = 10
+
+
+def create_summary_tables(connection):
+    """Creates the tables holding the running age aggregates of
+    `user_data`: a single row of count, sum and sum of squares, and a
+    histogram of AGE_BUCKET wide buckets. When they are new, they are
+    filled from the rows `user_data` already holds.
+    """
+    if not _has_table(connection, 'user_age_summary'):
+        reconcile_age_summary(connection)
+        return
+    _create_summary_tables(connection)
+
+
+def _create_summary_tables(connection):
+    """Runs the CREATE TABLE IF NOT EXISTS of the age summary tables."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `user_age_summary` (
+        id TINYINT PRIMARY KEY,
+        row_count BIGINT NOT NULL,
+        age_sum BIGINT NOT NULL,
+        age_sum_sq BIGINT NOT NULL,
+        min_age INT,
+        max_age INT
+        ) ENGINE=InnoDB;
+        """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `user_age_histogram` (
+        bucket INT PRIMARY KEY,
+        row_count BIGINT NOT NULL
+        ) ENGINE=InnoDB;
+        """)
+    connection.commit()
+    cursor.close()
+
+
+def _has_table(connection, table):
+    """Returns True when the ALX_prodev database has a table <table>."""
+    cursor = connection.cursor()
+    cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;", (table,))
+    (count,) = cursor.fetchone()
+    cursor.close()
+    return count > 0
+
+
+def record_ages(cursor, ages):
+    """Adds newly inserted <ages> to the age summary tables. Runs on the
+    inserting cursor so the summary commits together with the rows.
+    """
+    if not ages:
+        return
+    buckets = {}
+    for age in ages:
+        bucket = age // AGE_BUCKET * AGE_BUCKET
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    cursor.execute(
+            "INSERT INTO user_age_summary "
+            "(id, row_count, age_sum, age_sum_sq, min_age, max_age) "
+            "VALUES (1, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+            "row_count = row_count + VALUES(row_count), "
+            "age_sum = age_sum + VALUES(age_sum), "
+            "age_sum_sq = age_sum_sq + VALUES(age_sum_sq), "
+            "min_age = LEAST(COALESCE(min_age, VALUES(min_age)), "
+            "VALUES(min_age)), "
+            "max_age = GREATEST(COALESCE(max_age, VALUES(max_age)), "
+            "VALUES(max_age));",
+            (len(ages), sum(ages), sum(age * age for age in ages),
+             min(ages), max(ages)))
+    cursor.executemany(
+            "INSERT INTO user_age_histogram (bucket, row_count) "
+            "VALUES (%s, %s) ON DUPLICATE KEY UPDATE "
+            "row_count = row_count + VALUES(row_count);",
+            sorted(buckets.items()))
+
+
+def reconcile_age_summary(connection):
+    """Rebuilds the age summary tables from a full scan of `user_data`,
+    e.g. after rows were written outside `insert_data`. Run it while no
+    other inserts are in flight.
+    """
+    _create_summary_tables(connection)
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM user_age_summary;")
+    cursor.execute("DELETE FROM user_age_histogram;")
+    cursor.execute(
+            "INSERT INTO user_age_summary "
+            "(id, row_count, age_sum, age_sum_sq, min_age, max_age) "
+            "SELECT 1, COUNT(*), COALESCE(SUM(age), 0), "
+            "COALESCE(SUM(age * age), 0), MIN(age), MAX(age) "
+            "FROM user_data;")
+    cursor.execute(
+            "INSERT INTO user_age_histogram (bucket, row_count) "
+            "SELECT FLOOR(age / %s) * %s AS bucket, COUNT(*) "
+            "FROM user_data GROUP BY bucket;", (AGE_BUCKET, AGE_BUCKET))
+    connection.commit()
+    cursor.close()
+
+
+def _has_column(connection, column):
+    """Returns True when `user_data` has a column named <column>."""
+    cursor = connection.cursor()
+    cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = %s;", (column,))
+    (count,) = cursor.fetchone()
+    cursor.close()
+    return count > 0
+
+
+def add_sequence_column(connection):
+    """Adds the AUTO_INCREMENT `seq` column, numbering existing rows, to a
+    `user_data` table created before it existed.
+    """
+    if _has_column(connection, 'seq'):
+        return
+    cursor = connection.cursor()
+    cursor.execute("ALTER TABLE user_data ADD COLUMN "
+                   "seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE;")
+    connection.commit()
+    cursor.close()
+
+
+def uses_binary_ids(connection):
+    """Returns True when `user_data.user_id` is stored as BINARY(16)."""
+    cursor = connection.cursor()
+    cursor.execute(
+            "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = 'user_id';")
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return False
+    data_type = row[0]
+    if isinstance(data_type, (bytes, bytearray)):
+        data_type = data_type.decode()
+    return data_type.lower() == 'binary'
+
+
+def time_ordered_uuid():
+    """Returns the 16 bytes of a version 7 UUID. The leading 48 bits are a
+    millisecond timestamp, so new keys land at the right edge of the
+    primary key index instead of at random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80
+    value |= int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | (0x7 << 76)
+    value = value & ~(0x3 << 62) | (0x2 << 62)
+    return value.to_bytes(16, 'big')
+
+
+def new_user_id(binary_ids=False):
+    """Returns a fresh user_id for the CHAR(36) or BINARY(16) schema."""
+    return time_ordered_uuid() if binary_ids else str(uuid4())
+
+
+def upgrade_table(connection):
+    """Migrates an existing `user_data` table to the compact schema:
+    BINARY(16) user_id keys, the `seq` column and the secondary indexes in
+    `USER_INDEXES`. Existing keys and sequence numbers keep their value;
+    new rows get time ordered keys. `user_data` is write locked while it
+    is copied (RENAME under LOCK TABLES needs MySQL 8.0.13 or later).
+
+    Args:
+        connection (MySQLConnection): A MySQL Database - ALX_prodev
+    """
+    add_sequence_column(connection)
+    create_summary_tables(connection)
+    cursor = connection.cursor()
+    if not uses_binary_ids(connection):
+        cursor.execute("DROP TABLE IF EXISTS `user_data_new`;")
+        cursor.execute(_table_ddl('user_data_new', True))
+        # Writers block from the copy until the rename, so no row written
+        # in between is lost.
+        cursor.execute("LOCK TABLES user_data WRITE, user_data_new WRITE;")
+        try:
+            cursor.execute(
+                    "INSERT INTO user_data_new "
+                    "(user_id, name, email, age, seq) "
+                    "SELECT UNHEX(REPLACE(user_id, '-', '')), name, email, "
+                    "age, seq FROM user_data;")
+            connection.commit()
+            cursor.execute("RENAME TABLE user_data TO user_data_old, "
+                           "user_data_new TO user_data;")
+        finally:
+            cursor.execute("UNLOCK TABLES;")
+        cursor.execute("DROP TABLE user_data_old;")
+
+    cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data';")
+    existing = {row[0] for row in cursor.fetchall()}
+    for name, columns in USER_INDEXES.items():
+        if name not in existing:
+            cursor.execute("ALTER TABLE user_data ADD INDEX {} {};".format(
+                name, columns))
+    connection.commit()
+    cursor.close()
+    print("Table user_data upgraded successfully")
+
+
+def read_users(data):
+    """Yields (name, email, age) tuples from a csv file.
+
+    Args:
+        data (str): Name of the csv file to read.
+    """
+    with open(data, mode='r', newline='', encoding='utf-8') as file:
+        users = csv.DictReader(file)
+        for user in users:
+            yield user.get('name'), user.get('email'), int(user.get('age'))
+
+
+def _csv_ranges(data, parts):
+    """Splits the csv file <data> after its header into <parts> byte ranges
+    that start and end on line boundaries.
+
+    Returns:
+        tuple: (header, list of (start, end) ranges)
+    """
+    if os.path.getsize(data) == 0:
+        return [], []
+    with open(data, mode='rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as memory:
+        size = len(memory)
+        start = memory.find(b'\n') + 1 or size
+        header = next(csv.reader([memory[:start].decode('utf-8')]))
+        bounds = [start]
+        for i in range(1, parts):
+            position = max(start + (size - start) * i // parts, bounds[-1])
+            newline = memory.find(b'\n', position)
+            bounds.append(size if newline == -1 else newline + 1)
+        bounds.append(size)
+    ranges = [(low, high) for low, high in zip(bounds[:-1], bounds[1:])
+              if low < high]
+    return header, ranges
+
+
+def _parse_csv_range(job):
+    """Parses one byte range of a csv file into name, email and age
+    columns.
+    """
+    data, start, end, columns = job
+    with open(data, mode='rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as memory:
+        text = memory[start:end].decode('utf-8')
+    name, email, age = columns
+    names, emails, ages = [], [], []
+    for row in csv.reader(text.splitlines()):
+        if not row:
+            continue
+        names.append(row[name])
+        emails.append(row[email])
+        ages.append(int(row[age]))
+    return names, emails, ages
+
+
+def read_users_parallel(data, workers=None):
+    """Yields (name, email, age) tuples from a csv file parsed in parallel.
+
+    The file is memory mapped and split into newline aligned byte ranges,
+    each parsed into column lists by a process pool. Fields must not
+    contain embedded newlines.
+
+    Args:
+        data (str): Name of the csv file to read.
+        workers (int): Number of parser processes, defaults to the number
+            of CPUs.
+    """
+    workers = workers or os.cpu_count() or 1
+    header, ranges = _csv_ranges(data, workers * 4)
+    if not ranges:
+        return
+    columns = tuple(header.index(column)
+                    for column in ('name', 'email', 'age'))
+    jobs = [(data, start, end, columns) for start, end in ranges]
+    with Pool(workers) as pool:
+        for names, emails, ages in pool.imap(_parse_csv_range, jobs):
+            yield from zip(names, emails, ages)
+
+
+def existing_users(connection):
+    """Returns a set of (name, email, age) keys already in `user_data`.
+
+    Args:
+        connection (MySQLConnection): A MySQL Database - ALX_prodev
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, email, age FROM user_data;")
+    keys = {(name, email, int(age)) for name, email, age in cursor}
+    cursor.close()
+    return keys
+
+
+def bulk_insert(connection, users, chunk_size=5000, load_data=False):
+    """Inserts (name, email, age) tuples into `user_data` in chunks,
+    committing once per chunk.
+
+    Args:
+        connection (MySQLConnection): A MySQL Database - ALX_prodev
+        users (iterable): (name, email, age) tuples to insert.
+        chunk_size (int): Rows sent and committed per chunk.
+        load_data (bool): Send each chunk with LOAD DATA LOCAL INFILE
+            instead of a multi-row INSERT. The connection must be opened
+            with allow_local_infile=True.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    queryStr = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s);
+    """
+    binary_ids = uses_binary_ids(connection)
+    summary = _has_table(connection, 'user_age_summary')
+    cursor = connection.cursor()
+    count = 0
+    chunk = []
+    for name, email, age in users:
+        chunk.append((new_user_id(binary_ids), name, email, age))
+        if len(chunk) >= chunk_size:
+            _send_chunk(cursor, queryStr, chunk, load_data)
+            if summary:
+                record_ages(cursor, [user[3] for user in chunk])
+            connection.commit()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        _send_chunk(cursor, queryStr, chunk, load_data)
+        if summary:
+            record_ages(cursor, [user[3] for user in chunk])
+        connection.commit()
+        count += len(chunk)
+    cursor.close()
+    return count
+
+
+def _send_chunk(cursor, queryStr, chunk, load_data):
+    """Sends one chunk of rows to the server."""
+    if not load_data:
+        cursor.executemany(queryStr, chunk)
+        return
+    with tempfile.NamedTemporaryFile(mode='w', newline='', encoding='utf-8',
+                                     suffix='.csv', delete=False) as file:
+        writer = csv.writer(file)
+        for user_id, name, email, age in chunk:
+            if isinstance(user_id, bytes):
+                user_id = user_id.hex()
+            writer.writerow((user_id, name, email, age))
+    try:
+        cursor.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE user_data "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                "ESCAPED BY '' "
+                "LINES TERMINATED BY '\\r\\n' "
+                "(@user_id, name, email, age) "
+                "SET user_id = IF(LENGTH(@user_id) = 32, UNHEX(@user_id), "
+                "@user_id);", (file.name,))
+    finally:
+        os.remove(file.name)
+
+
+def insert_data(connection, data, bulk=False, chunk_size=5000,
+                load_data=False, workers=None):
     """Inserts data into the `user_data` table.
 
     Args:
         connection (MySQLConnection): A MySQL Database - ALX_prodev
         data (str): Name of the csv file to copy data from.
+        bulk (bool): Deduplicate through a hashed set and send rows in
+            batched chunks instead of one INSERT per row.
+        chunk_size (int): Rows per batch/commit in bulk mode.
+        load_data (bool): Use LOAD DATA LOCAL INFILE in bulk mode.
+        workers (int): Parse the csv with this many processes in bulk
+            mode, see `read_users_parallel`.
 
     Returns:
-        None
+        int: Number of rows inserted.
     """
     if isinstance(connection, (MySQLConnection, CMySQLConnection)):
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM user_data;")
-        old_users = cursor.fetchall()
-
-        with open(data, mode='r', newline='', encoding='utf-8') as file:
-            users = csv.DictReader(file)
-            for user in users:
-                name = user.get('name')
-                email = user.get('email')
-                age = int(user.get('age'))
-
-                old_user = [person for person in old_users if person[1] == name and
-                            person[2] == email and int(person[3]) == age]
-                if old_user:
-                    continue
-                queryStr = """
-                INSERT INTO user_data (user_id, name, email, age)
-                VALUES (%s, %s, %s, %s);
-                """
-                cursor.execute(queryStr, (str(uuid4()), name, email, age))
-        connection.commit()
+        start = time.perf_counter()
+        if bulk:
+            seen = existing_users(connection)
+            if workers:
+                users = read_users_parallel(data, workers)
+            else:
+                users = read_users(data)
+
+            def new_users():
+                for user in users:
+                    if user in seen:
+                        continue
+                    seen.add(user)
+                    yield user
+
+            count = bulk_insert(connection, new_users(), chunk_size,
+                                load_data)
+        else:
+            count = _insert_rows(connection, data)
+        elapsed = time.perf_counter() - start
+        print("Inserted {} rows in {:.2f}s ({:.0f} rows/sec)".format(
+            count, elapsed, count / elapsed if elapsed else 0))
+        return count
+
+
+def _insert_rows(connection, data):
+    """Inserts rows one by one, skipping users already in the table."""
+    binary_ids = uses_binary_ids(connection)
+    summary = _has_table(connection, 'user_age_summary')
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM user_data;")
+    old_users = cursor.fetchall()
+    ages = []
+
+    with open(data, mode='r', newline='', encoding='utf-8') as file:
+        users = csv.DictReader(file)
+        for user in users:
+            name = user.get('name')
+            email = user.get('email')
+            age = int(user.get('age'))
+
+            old_user = [person for person in old_users if person[1] == name and
+                        person[2] == email and int(person[3]) == age]
+            if old_user:
+                continue
+            queryStr = """
+            INSERT INTO user_data (user_id, name, email, age)
+            VALUES (%s, %s, %s, %s);
+            """
+            cursor.execute(queryStr,
+                           (new_user_id(binary_ids), name, email, age))
+            ages.append(age)
+    if summary:
+        record_ages(cursor, ages)
+    connection.commit()
+    return len(ages)
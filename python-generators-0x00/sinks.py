@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+"""Buffered output sinks for streamed users.
+
+Rows are encoded into an in-memory buffer and written out in large chunks
+instead of one write per row.
+
+    ReprSink     one repr per line, the same output as print(row)
+    NDJSONSink   one JSON object per line
+    CSVSink      csv with a header row
+    ArrowSink    Arrow IPC stream of record batches (needs pyarrow)
+"""
+import csv
+import io
+import json
+from uuid import UUID
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def as_dict(row, column_names=None):
+    """Returns <row> as a dict whatever its row format. Plain tuples are
+    keyed by <column_names>, or by position when it is None.
+    """
+    if isinstance(row, dict):
+        return row
+    if hasattr(row, '_asdict'):
+        return row._asdict()
+    if hasattr(row, 'as_dict'):
+        return row.as_dict()
+    if column_names is not None:
+        return dict(zip(column_names, row))
+    return dict(enumerate(row))
+
+
+def _json_default(value):
+    """Encodes values json does not know, e.g. BINARY(16) user ids."""
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) == 16:
+            return str(UUID(bytes=bytes(value)))
+        return bytes(value).hex()
+    return str(value)
+
+
+class Sink():
+    """Base class of the text sinks: buffers encoded rows and writes them
+    once at least <buffer_size> characters are pending.
+    """
+    def __init__(self, file, buffer_size=1 << 16, column_names=None):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            file (file): Text file to write to, e.g. sys.stdout.
+            buffer_size (int): Characters buffered before a write.
+            column_names (tuple): Names of the fields of tuple rows, e.g.
+                `cursor.column_names`; a write can pass its own.
+        """
+        self.file = file
+        self.buffer_size = buffer_size
+        self.column_names = column_names
+        self.__buffer = []
+        self.__pending = 0
+
+    def encode(self, row, column_names):
+        """Returns <row> encoded as text."""
+        raise NotImplementedError
+
+    def write(self, row, column_names=None):
+        """Buffers one row."""
+        text = self.encode(row, column_names or self.column_names)
+        self.__buffer.append(text)
+        self.__pending += len(text)
+        if self.__pending >= self.buffer_size:
+            self.flush()
+
+    def write_batch(self, rows, column_names=None):
+        """Buffers a batch of rows."""
+        column_names = column_names or self.column_names
+        texts = [self.encode(row, column_names) for row in rows]
+        self.__buffer.extend(texts)
+        self.__pending += sum(map(len, texts))
+        if self.__pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes everything buffered so far."""
+        if self.__buffer:
+            chunk = ''.join(self.__buffer)
+            self.__buffer = []
+            self.__pending = 0
+            self.file.write(chunk)
+        self.file.flush()
+
+    def close(self):
+        """Flushes the sink. The file itself is left open."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class ReprSink(Sink):
+    """Writes rows exactly as print(row) would."""
+    def encode(self, row, column_names):
+        return "{}\n".format(row)
+
+
+class NDJSONSink(Sink):
+    """Writes one JSON object per row."""
+    def encode(self, row, column_names):
+        return json.dumps(as_dict(row, column_names),
+                          default=_json_default) + '\n'
+
+
+class CSVSink(Sink):
+    """Writes rows as csv, with a header taken from the first row."""
+    def __init__(self, file, buffer_size=1 << 16, column_names=None):
+        super().__init__(file, buffer_size, column_names)
+        self.__text = io.StringIO()
+        self.__writer = None
+
+    def encode(self, row, column_names):
+        row = as_dict(row, column_names)
+        if self.__writer is None:
+            self.__writer = csv.DictWriter(self.__text, fieldnames=list(row))
+            self.__writer.writeheader()
+        self.__writer.writerow(row)
+        text = self.__text.getvalue()
+        self.__text.seek(0)
+        self.__text.truncate()
+        return text
+
+
+class ArrowSink():
+    """Writes rows as an Arrow IPC stream, one record batch per
+    <batch_rows> rows.
+    """
+    def __init__(self, file, batch_rows=65536, column_names=None):
+        """Creates an instance of the class with passed arguments.
+        Args:
+            file (file): Binary file to write to, e.g. sys.stdout.buffer.
+            batch_rows (int): Rows per record batch.
+            column_names (tuple): See `Sink`.
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for the Arrow sink.")
+        self.file = file
+        self.batch_rows = batch_rows
+        self.column_names = column_names
+        self.__rows = []
+        self.__writer = None
+
+    def write(self, row, column_names=None):
+        """Buffers one row."""
+        self.__rows.append(as_dict(row, column_names or self.column_names))
+        if len(self.__rows) >= self.batch_rows:
+            self.__write_batch()
+
+    def write_batch(self, rows, column_names=None):
+        """Buffers a batch of rows."""
+        column_names = column_names or self.column_names
+        self.__rows.extend(as_dict(row, column_names) for row in rows)
+        if len(self.__rows) >= self.batch_rows:
+            self.__write_batch()
+
+    def write_columns(self, columns):
+        """Writes a columnar batch, e.g. from `stream_users_in_batches`
+        with columnar=True, as one record batch without going through
+        per row dicts.
+        """
+        self.__write_batch()
+        self.__write(pa.RecordBatch.from_pydict(columns))
+
+    def __write_batch(self):
+        if not self.__rows:
+            return
+        batch = pa.RecordBatch.from_pylist(self.__rows)
+        self.__rows = []
+        self.__write(batch)
+
+    def __write(self, batch):
+        if self.__writer is None:
+            self.__writer = pa.ipc.new_stream(self.file, batch.schema)
+        self.__writer.write_batch(batch)
+
+    def flush(self):
+        """Writes everything buffered so far as a record batch."""
+        self.__write_batch()
+        self.file.flush()
+
+    def close(self):
+        """Flushes and ends the IPC stream. The file is left open."""
+        self.__write_batch()
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+        self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
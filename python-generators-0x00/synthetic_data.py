@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""Generates synthetic `user_data` rows at scale, in the same csv layout as
+`user_data.csv`, and loads them into MySQL or a local SQLite stand-in.
+
+Usage: ./synthetic_data.py rows [path]
+"""
+import random
+import sqlite3
+import sys
+import uuid
+seed = __import__('seed')
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FIRST_NAMES = (
+    'Johnnie', 'Myrtle', 'Flora', 'Dan', 'Glenda', 'Daniel', 'Ross',
+    'Edmund', 'Crawford', 'Nina', 'Amos', 'Lucia', 'Perry', 'Viola',
+    'Marco', 'Ida', 'Wilbur', 'Joy', 'Omar', 'Tessa',
+    )
+LAST_NAMES = (
+    'Mayer', 'Waters', 'Howell', 'Altenwerth', 'Wisozk', 'Reynolds',
+    'Funk', 'Cartwright', 'Kuhic', 'Schmitt', 'Bauch', 'Ortiz', 'Lind',
+    'Hane', 'Rempel', 'Kunze', 'Treutel', 'Yost', 'Greer', 'Bode',
+    )
+DOMAINS = ('gmail.com', 'hotmail.com', 'yahoo.com')
+MIN_AGE, MAX_AGE = 18, 100
+
+
+# Every row is PREFIXES[person] + row number + SUFFIXES[domain_age], so
+# generating a chunk is two index columns and one join. The row number
+# keeps every (name, email, age) unique, so bulk loads drop nothing.
+PREFIXES = ['"{0} {1}","{0}.{1}'.format(first, last)
+            for first in FIRST_NAMES for last in LAST_NAMES]
+SUFFIXES = ['@{}","{}"\n'.format(domain, age)
+            for domain in DOMAINS for age in range(MIN_AGE, MAX_AGE + 1)]
+
+
+def _columns(rows, rng):
+    """Returns the person and domain/age index columns for <rows> rows."""
+    if np is not None:
+        return (rng.integers(0, len(PREFIXES), rows).tolist(),
+                rng.integers(0, len(SUFFIXES), rows).tolist())
+    return (rng.choices(range(len(PREFIXES)), k=rows),
+            rng.choices(range(len(SUFFIXES)), k=rows))
+
+
+def generate(path, rows, random_seed=None, chunk_size=1_000_000):
+    """Writes <rows> synthetic users to the csv file <path>.
+
+    Columns are drawn as whole index arrays (with NumPy when available)
+    and each chunk is written with a single call.
+
+    Args:
+        path (str): Output csv file.
+        rows (int): Number of rows to write.
+        random_seed (int): Seed for reproducible output.
+        chunk_size (int): Rows generated and written at a time.
+    """
+    rng = np.random.default_rng(random_seed) if np is not None \
+        else random.Random(random_seed)
+    with open(path, mode='w', newline='', encoding='utf-8') as file:
+        file.write('"name","email","age"\n')
+        written = 0
+        while written < rows:
+            size = min(chunk_size, rows - written)
+            people, suffixes = _columns(size, rng)
+            file.write(''.join([
+                PREFIXES[p] + str(n) + SUFFIXES[s]
+                for p, n, s in zip(people, range(written, written + size),
+                                   suffixes)]))
+            written += size
+
+
+def load_mysql(path, chunk_size=50_000):
+    """Bulk loads the csv file <path> into the MySQL `user_data` table."""
+    connection = seed.connect_to_prodev()
+    try:
+        seed.create_table(connection)
+        return seed.insert_data(connection, path, bulk=True,
+                                chunk_size=chunk_size)
+    finally:
+        connection.close()
+
+
+def load_sqlite(path, database='user_data.db', chunk_size=50_000):
+    """Loads the csv file <path> into a `user_data` table in a local SQLite
+    database, replacing its previous contents.
+    """
+    connection = sqlite3.connect(database)
+    try:
+        connection.execute("DROP TABLE IF EXISTS user_data")
+        connection.execute("""
+        CREATE TABLE user_data (
+        user_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        age INTEGER NOT NULL
+        )""")
+        chunk = []
+        for name, email, age in seed.read_users(path):
+            chunk.append((str(uuid.uuid4()), name, email, age))
+            if len(chunk) >= chunk_size:
+                connection.executemany(
+                        "INSERT INTO user_data VALUES (?, ?, ?, ?)", chunk)
+                chunk = []
+        connection.executemany(
+                "INSERT INTO user_data VALUES (?, ?, ?, ?)", chunk)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    generate(sys.argv[2] if len(sys.argv) > 2 else 'user_data_large.csv',
+             int(sys.argv[1]))